@@ -0,0 +1,88 @@
+import multiprocessing
+import os
+import sys
+import time
+
+from logic import *
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python batch.py puzzle|directory [...]")
+    filenames = puzzle_files(sys.argv[1:])
+
+    # Solve puzzles across worker processes, reporting each as it finishes
+    with multiprocessing.Pool() as pool:
+        for filename, seconds, entailed, error in pool.imap_unordered(
+            solve, filenames, chunksize=16
+        ):
+            if error is not None:
+                print(f"{filename} (error: {error})")
+                continue
+            print(f"{filename} ({seconds:.4f}s)")
+            for symbol in entailed:
+                print(f"    {symbol}")
+
+
+def puzzle_files(paths):
+    """
+    Return a list of puzzle files named by paths.
+    Directories are expanded to the .txt files directly inside them.
+    """
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(
+                os.path.join(path, filename)
+                for filename in sorted(os.listdir(path))
+                if filename.endswith(".txt")
+            )
+        else:
+            filenames.append(path)
+    return filenames
+
+
+def load_puzzle(filename):
+    """
+    Load a puzzle from a file into a knowledge base.
+    Each line of the file is one formula, in the syntax accepted by
+    logic.parse; blank lines and lines starting with # are ignored.
+    """
+    knowledge = And()
+    with open(filename) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                knowledge.add(parse(line))
+    return knowledge
+
+
+def solve(filename):
+    """
+    Solve the puzzle in filename, returning a tuple of the filename,
+    the time taken in seconds, the list of entailed symbols, and None,
+    or of the filename, the time, None and an error message if the
+    puzzle can't be read or has no formulas.
+    """
+    start = time.perf_counter()
+    try:
+        knowledge = load_puzzle(filename)
+    except (OSError, ValueError) as e:
+        return filename, time.perf_counter() - start, None, str(e)
+    if len(knowledge.conjuncts) == 0:
+        return filename, time.perf_counter() - start, None, "no formulas"
+    symbols = [Symbol(name) for name in sorted(knowledge.symbols())]
+
+    # Each puzzle is only solved once, so don't keep its models around
+    entailed = [
+        symbol for symbol, is_entailed
+        in zip(symbols, model_check_all(knowledge, symbols, EntailmentCache()))
+        if is_entailed
+    ]
+    return filename, time.perf_counter() - start, entailed, None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import csv
+import json
+import random
+import sys
+import time
+
+from generate import generate_puzzle
+from logic import *
+
+# Puzzles timed per number of characters
+PUZZLES = 5
+
+# Symbols fixed into cubes by the parallel engine
+SPLIT = 3
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [2, 3]:
+        sys.exit("Usage: python benchmark.py report.json|report.csv [max]")
+    report = sys.argv[1]
+    largest = int(sys.argv[2]) if len(sys.argv) == 3 else 12
+
+    engines = [
+        ("model_check", lambda kb, queries: [
+            model_check(kb, query) for query in queries
+        ]),
+        ("model_check_all", lambda kb, queries: model_check_all(
+            kb, queries, EntailmentCache()
+        )),
+        ("model_check_parallel", lambda kb, queries: [
+            model_check(kb, query, split=SPLIT) for query in queries
+        ]),
+        ("resolution_check", lambda kb, queries: [
+            resolution_check(kb, query) for query in queries
+        ])
+    ]
+
+    rng = random.Random(0)
+    results = []
+    for characters in range(2, largest + 1):
+        statements = 2 * characters
+        puzzles = [
+            generate_puzzle(characters, statements, rng)
+            for _ in range(PUZZLES)
+        ]
+
+        # Check every engine against model checking over all queries at once
+        reference = [
+            model_check_all(knowledge, list(solution), EntailmentCache())
+            for knowledge, solution in puzzles
+        ]
+        for name, engine in engines:
+            seconds, agree = time_engine(engine, puzzles, reference)
+            results.append({
+                "engine": name,
+                "characters": characters,
+                "statements": statements,
+                "seconds": seconds,
+                "agree": agree
+            })
+            print(f"{name:>20} {characters:>3} characters: {seconds:.4f}s"
+                  + ("" if agree else "  (wrong answers)"))
+
+    # Write report in the format given by its extension
+    with open(report, "w") as f:
+        if report.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=list(results[0]))
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, f, indent=4)
+
+
+def time_engine(engine, puzzles, reference):
+    """
+    Time engine on each puzzle, asking whether each character is a knight.
+    Return a tuple of the mean time in seconds per puzzle, and whether
+    every answer matched the reference answers for that puzzle and every
+    entailed answer agreed with the puzzle's hidden solution.
+    """
+    total = 0
+    agree = True
+    for (knowledge, solution), expected in zip(puzzles, reference):
+        queries = list(solution)
+
+        # Time from a cold cache
+        start = time.perf_counter()
+        entailed = engine(knowledge, queries)
+        total += time.perf_counter() - start
+
+        # Entailed symbols must be knights in the hidden solution
+        agree = agree and list(entailed) == expected and all(
+            solution[query] for query, is_entailed in zip(queries, entailed)
+            if is_entailed
+        )
+    return total / len(puzzles), agree
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import os
+import random
+import sys
+
+from logic import *
+
+
+def main():
+
+    # Check for proper usage
+    if len(sys.argv) not in [5, 6]:
+        sys.exit(
+            "Usage: python generate.py characters statements count "
+            "directory [seed]"
+        )
+    characters = int(sys.argv[1])
+    statements = int(sys.argv[2])
+    count = int(sys.argv[3])
+    directory = sys.argv[4]
+    seed = int(sys.argv[5]) if len(sys.argv) == 6 else None
+
+    # Write each puzzle in the format read by batch.py
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    for i in range(count):
+        knowledge, _ = generate_puzzle(characters, statements, rng)
+        with open(os.path.join(directory, f"puzzle{i}.txt"), "w") as f:
+            f.write(f"# {characters} characters, {statements} statements\n")
+            for conjunct in knowledge.conjuncts:
+                f.write(conjunct.formula() + "\n")
+
+
+def character_names(n):
+    """
+    Return n character names: A through Z, then AA, AB and so on.
+    """
+    names = []
+    for i in range(n):
+        name = ""
+        i += 1
+        while i:
+            i, remainder = divmod(i - 1, 26)
+            name = chr(ord("A") + remainder) + name
+        names.append(name)
+    return names
+
+
+def generate_puzzle(characters, statements, rng=random):
+    """
+    Generate a random knights and knaves puzzle.
+
+    Each character is secretly assigned to be a knight or a knave, then
+    makes random claims about the others that are true if they are a
+    knight and false if they are a knave, so the puzzle is satisfiable.
+    Return a tuple of the knowledge base and a dictionary mapping each
+    character's "is a Knight" symbol to whether they are one.
+    """
+    names = character_names(characters)
+    knight = {name: Symbol(f"{name} is a Knight") for name in names}
+    knave = {name: Symbol(f"{name} is a Knave") for name in names}
+    is_knight = {name: rng.random() < 0.5 for name in names}
+
+    # Info from structure of problem
+    knowledge = And()
+    for name in names:
+        knowledge.add(Or(knight[name], knave[name]))
+        knowledge.add(Implication(knight[name], Not(knave[name])))
+
+    # Info from statements, redrawn until honest for the speaker
+    model = dict()
+    for name in names:
+        model[knight[name].name] = is_knight[name]
+        model[knave[name].name] = not is_knight[name]
+    for _ in range(statements):
+        speaker = rng.choice(names)
+        while True:
+            claim = random_claim(names, knight, knave, rng)
+            if claim.evaluate(model) == is_knight[speaker]:
+                break
+        knowledge.add(Biconditional(knight[speaker], claim))
+
+    solution = {knight[name]: is_knight[name] for name in names}
+    return knowledge, solution
+
+
+def random_claim(names, knight, knave, rng):
+    """
+    Return a random claim one character could make about one or two
+    characters, such as "B is a knave" or "A and C are the same kind".
+    """
+    x = rng.choice(names)
+    y = rng.choice([name for name in names if name != x] or names)
+    kind = rng.randrange(6)
+    if kind == 0:
+        return knight[x]
+    if kind == 1:
+        return knave[x]
+    if kind == 2:
+        return Or(And(knight[x], knight[y]), And(knave[x], knave[y]))
+    if kind == 3:
+        return Or(And(knight[x], knave[y]), And(knave[x], knight[y]))
+    if kind == 4:
+        return Or(knight[x], knight[y])
+    return And(knave[x], knave[y])
+
+
+if __name__ == "__main__":
+    main()
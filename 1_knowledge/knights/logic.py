@@ -1,4 +1,8 @@
+import collections
+import heapq
 import itertools
+import multiprocessing
+import re
 
 
 class Sentence():
@@ -7,6 +11,14 @@ class Sentence():
         """Evaluates the logical sentence."""
         raise Exception("nothing to evaluate")
 
+    def evaluate_partial(self, model):
+        """
+        Evaluates the logical sentence under a partial model.
+        Returns True or False if the assigned symbols decide the sentence,
+        and None if its value still depends on unassigned symbols.
+        """
+        raise Exception("nothing to evaluate")
+
     def formula(self):
         """Returns string formula representing logical sentence."""
         return ""
@@ -62,6 +74,10 @@ class Symbol(Sentence):
         except KeyError:
             raise EvaluationException(f"variable {self.name} not in model")
 
+    def evaluate_partial(self, model):
+        value = model.get(self.name)
+        return None if value is None else bool(value)
+
     def formula(self):
         return self.name
 
@@ -86,6 +102,10 @@ class Not(Sentence):
     def evaluate(self, model):
         return not self.operand.evaluate(model)
 
+    def evaluate_partial(self, model):
+        value = self.operand.evaluate_partial(model)
+        return None if value is None else not value
+
     def formula(self):
         return "¬" + Sentence.parenthesize(self.operand.formula())
 
@@ -120,6 +140,16 @@ class And(Sentence):
     def evaluate(self, model):
         return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
 
+    def evaluate_partial(self, model):
+        result = True
+        for conjunct in self.conjuncts:
+            value = conjunct.evaluate_partial(model)
+            if value is False:
+                return False
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.conjuncts) == 1:
             return self.conjuncts[0].formula()
@@ -151,6 +181,16 @@ class Or(Sentence):
     def evaluate(self, model):
         return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
 
+    def evaluate_partial(self, model):
+        result = False
+        for disjunct in self.disjuncts:
+            value = disjunct.evaluate_partial(model)
+            if value is True:
+                return True
+            if value is None:
+                result = None
+        return result
+
     def formula(self):
         if len(self.disjuncts) == 1:
             return self.disjuncts[0].formula()
@@ -183,6 +223,17 @@ class Implication(Sentence):
         return ((not self.antecedent.evaluate(model))
                 or self.consequent.evaluate(model))
 
+    def evaluate_partial(self, model):
+        antecedent = self.antecedent.evaluate_partial(model)
+        if antecedent is False:
+            return True
+        consequent = self.consequent.evaluate_partial(model)
+        if consequent is True:
+            return True
+        if antecedent is True and consequent is False:
+            return False
+        return None
+
     def formula(self):
         antecedent = Sentence.parenthesize(self.antecedent.formula())
         consequent = Sentence.parenthesize(self.consequent.formula())
@@ -216,48 +267,521 @@ class Biconditional(Sentence):
                 or (not self.left.evaluate(model)
                     and not self.right.evaluate(model)))
 
+    def evaluate_partial(self, model):
+        left = self.left.evaluate_partial(model)
+        if left is None:
+            return None
+        right = self.right.evaluate_partial(model)
+        if right is None:
+            return None
+        return left == right
+
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
+        left = Sentence.parenthesize(self.left.formula())
+        right = Sentence.parenthesize(self.right.formula())
         return f"{left} <=> {right}"
 
     def symbols(self):
         return set.union(self.left.symbols(), self.right.symbols())
 
 
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
-
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+def model_check(knowledge, query, split=0, processes=None):
+    """
+    Checks if knowledge base entails query.
 
-        # If model has an assignment for each symbol
-        if not symbols:
-
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
-            return True
-        else:
-
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
-
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
-
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
-
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
+    If `split` is positive, the first `split` symbols are fixed into
+    2^split cubes, which are checked in a pool of `processes` worker
+    processes. The pool is terminated as soon as any worker finds a
+    counter-model.
+    """
 
     # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
 
     # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    split = min(split, len(symbols))
+    if not split:
+        return check_cube((knowledge, query, symbols, dict()))
+
+    # Fix the first symbols into cubes, skipping any already decided
+    tasks = []
+    for values in itertools.product((True, False), repeat=split):
+        cube = dict(zip(symbols[:split], values))
+        entailed = check_partial(knowledge, query, cube)
+        if entailed is False:
+            return False
+        if entailed is None:
+            tasks.append((knowledge, query, symbols[split:], cube))
+
+    # Leaving the pool terminates any workers still searching
+    with multiprocessing.Pool(processes) as pool:
+        for entailed in pool.imap_unordered(check_cube, tasks):
+            if not entailed:
+                return False
+    return True
+
+
+def check_partial(knowledge, query, model):
+    """
+    Checks if knowledge base entails query, given a partial model.
+    Returns True if every completion of the model entails query,
+    False if the model is a counter-model, and None if undecided.
+    """
+
+    # Branches where the knowledge base is false entail anything
+    knowledge_value = knowledge.evaluate_partial(model)
+    if knowledge_value is False:
+        return True
+
+    # Query is already true in every completion
+    query_value = query.evaluate_partial(model)
+    if query_value is True:
+        return True
+
+    # Knowledge base is true while query is false
+    if knowledge_value is True and query_value is False:
+        return False
+    return None
+
+
+def check_cube(task):
+    """
+    Checks if knowledge base entails query in every completion of a cube.
+    Takes a single (knowledge, query, symbols, cube) tuple, where symbols
+    are those left unassigned by cube, so it can be mapped over a pool.
+    """
+    knowledge, query, symbols, cube = task
+    return search(
+        symbols, cube,
+        lambda model: check_partial(knowledge, query, model)
+    )
+
+
+def search(symbols, model, check):
+    """
+    Searches assignments to symbols depth-first, extending model in place.
+
+    `check` is called on every partial model and returns True to prune the
+    branch, False to stop the search, or None to keep assigning symbols.
+    Returns False if the search was stopped, True otherwise.
+    """
+    result = check(model)
+    if result is not None:
+        return result
+
+    # Symbols assigned so far, in order, so that branches can be undone
+    assigned = []
+
+    # Each entry assigns a value to the symbol at a given depth
+    stack = [(0, False), (0, True)]
+    while stack:
+        depth, value = stack.pop()
+
+        # Undo assignments from the branch that was just finished
+        while len(assigned) > depth:
+            del model[assigned.pop()]
+
+        model[symbols[depth]] = value
+        assigned.append(symbols[depth])
+
+        result = check(model)
+        if result is False:
+            return False
+        if result is None:
+            stack.append((depth + 1, False))
+            stack.append((depth + 1, True))
+
+    # Leave model as it was given
+    for symbol in assigned:
+        del model[symbol]
+    return True
+
+
+def structure(sentence):
+    """
+    Returns an immutable snapshot of sentence as nested tuples of class
+    name and operands, which is equal for two sentences exactly when they
+    have the same structure and symbol names.
+    """
+    if isinstance(sentence, Symbol):
+        return ("Symbol", sentence.name)
+    if isinstance(sentence, Not):
+        return ("Not", structure(sentence.operand))
+    if isinstance(sentence, And):
+        return ("And",) + tuple(map(structure, sentence.conjuncts))
+    if isinstance(sentence, Or):
+        return ("Or",) + tuple(map(structure, sentence.disjuncts))
+    if isinstance(sentence, Implication):
+        return ("Implication", structure(sentence.antecedent),
+                structure(sentence.consequent))
+    if isinstance(sentence, Biconditional):
+        return ("Biconditional", structure(sentence.left),
+                structure(sentence.right))
+    raise TypeError("must be a logical sentence")
+
+
+class EntailmentCache():
+    """
+    Least recently used cache of the satisfying models, backbone and query
+    results that model_check_all computes for each knowledge base,
+    keeping at most maxsize knowledge bases.
+    """
+
+    def __init__(self, maxsize=16):
+        self.maxsize = maxsize
+        self.entries = collections.OrderedDict()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        """Returns the entry for key, or None, marking it as recently used."""
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry):
+        """Stores entry for key, evicting the least recently used entry."""
+        self.entries[key] = entry
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def clear(self):
+        self.entries.clear()
+
+
+# Cache used by model_check_all when the caller doesn't pass one
+entailment_cache = EntailmentCache()
+
+
+def satisfying_models(knowledge):
+    """Returns a list of all models in which knowledge base is true."""
+    symbols = sorted(knowledge.symbols())
+    models = []
+
+    def check(model):
+        """Records model once every symbol is assigned in it."""
+        if knowledge.evaluate_partial(model) is False:
+            return True
+        if len(model) == len(symbols):
+            models.append(model.copy())
+            return True
+        return None
+
+    search(symbols, dict(), check)
+    return models
+
+
+def model_check_all(knowledge, queries, cache=None):
+    """
+    Checks which of queries are entailed by knowledge base.
+
+    Satisfying models of the knowledge base are enumerated once, along with
+    its backbone (the symbols that have the same value in every model), and
+    every query is tested against them. Results are kept in cache, an
+    EntailmentCache defaulting to entailment_cache, so repeating a query
+    does not enumerate anything.
+    Returns a list of booleans in the same order as queries.
+    """
+
+    def check_models(query):
+        """Checks if query is true in every model of knowledge base."""
+
+        # Symbol queries are answered directly by the backbone
+        if isinstance(query, Symbol) and query.name in backbone:
+            return backbone[query.name]
+        if (isinstance(query, Not) and isinstance(query.operand, Symbol)
+                and query.operand.name in backbone):
+            return not backbone[query.operand.name]
+
+        # Symbols the knowledge base says nothing about can take any value
+        free = list(query.symbols() - knowledge.symbols())
+        for model in models:
+            for values in itertools.product((True, False), repeat=len(free)):
+                extended = model.copy()
+                extended.update(zip(free, values))
+                if not query.evaluate(extended):
+                    return False
+        return True
+
+    if cache is None:
+        cache = entailment_cache
+
+    # Sentences are mutable, so key on snapshots of their structure
+    key = structure(knowledge)
+    entry = cache.get(key)
+    if entry is None:
+        models = satisfying_models(knowledge)
+        backbone = {
+            name: value
+            for name, value in (models[0].items() if models else ())
+            if all(model[name] == value for model in models)
+        }
+        entry = (models, backbone, dict())
+        cache.put(key, entry)
+    models, backbone, results = entry
+
+    keys = [structure(query) for query in queries]
+    for query, query_key in zip(queries, keys):
+        if query_key not in results:
+            results[query_key] = check_models(query)
+    return [results[query_key] for query_key in keys]
+
+
+# Operators accepted by parse, in their formula() and ASCII spellings
+OPERATORS = {
+    "¬": "not", "~": "not", "!": "not",
+    "∧": "and", "&": "and",
+    "∨": "or", "|": "or",
+    "=>": "implies", "->": "implies",
+    "<=>": "iff", "<->": "iff",
+    "(": "(", ")": ")"
+}
+
+
+def parse(text):
+    """
+    Parses a formula, in the syntax produced by Sentence.formula(),
+    into a logical sentence.
+
+    From loosest to tightest binding, the operators are <=> (or <->),
+    => (or ->), ∨ (or |), ∧ (or &) and ¬ (or ~ or !). Any other run of
+    text, such as "A is a Knight", is the name of a symbol.
+    """
+    pieces = re.split(r"(<=>|<->|=>|->|[¬~!∧&∨|()])", text)
+    tokens = []
+    for piece in pieces:
+        piece = piece.strip()
+        if piece:
+            tokens.append((OPERATORS.get(piece, "symbol"), piece))
+    position = 0
+
+    def peek():
+        """Returns the kind of the next token, or None at the end."""
+        return tokens[position][0] if position < len(tokens) else None
+
+    def take(expected=None):
+        """Consumes the next token, which must be of kind expected if given."""
+        nonlocal position
+        kind = peek()
+        if kind is None or (expected is not None and kind != expected):
+            raise ValueError(f"expected {expected or 'formula'} in {text!r}")
+        position += 1
+        return tokens[position - 1]
+
+    def biconditional():
+        sentence = implication()
+        while peek() == "iff":
+            take()
+            sentence = Biconditional(sentence, implication())
+        return sentence
+
+    def implication():
+        sentence = disjunction()
+        if peek() == "implies":
+            take()
+            return Implication(sentence, implication())
+        return sentence
+
+    def disjunction():
+        disjuncts = [conjunction()]
+        while peek() == "or":
+            take()
+            disjuncts.append(conjunction())
+        return disjuncts[0] if len(disjuncts) == 1 else Or(*disjuncts)
+
+    def conjunction():
+        conjuncts = [negation()]
+        while peek() == "and":
+            take()
+            conjuncts.append(negation())
+        return conjuncts[0] if len(conjuncts) == 1 else And(*conjuncts)
+
+    def negation():
+        kind, piece = take()
+        if kind == "not":
+            return Not(negation())
+        if kind == "(":
+            sentence = biconditional()
+            take(")")
+            return sentence
+        if kind != "symbol":
+            raise ValueError(f"unexpected {piece!r} in {text!r}")
+        return Symbol(piece)
+
+    sentence = biconditional()
+    if peek() is not None:
+        raise ValueError(f"unexpected {tokens[position][1]!r} in {text!r}")
+    return sentence
+
+
+def clauses(sentence, positive=True):
+    """
+    Returns the clauses of sentence in conjunctive normal form, or of its
+    negation if positive is False. Each clause is a frozenset of literals,
+    and each literal a (symbol name, polarity) tuple. Tautologies are
+    left out, so a sentence that is always true has no clauses.
+    """
+
+    def disjoin(*cnfs):
+        """Returns the clauses of a disjunction of CNF sentences."""
+        result = [frozenset()]
+        for cnf in cnfs:
+            result = [
+                left | right for left in result for right in cnf
+                if not any((name, not value) in left for name, value in right)
+            ]
+        return result
+
+    if isinstance(sentence, Symbol):
+        return [frozenset({(sentence.name, positive)})]
+    if isinstance(sentence, Not):
+        return clauses(sentence.operand, not positive)
+    if isinstance(sentence, (And, Or)):
+        operands = (sentence.conjuncts if isinstance(sentence, And)
+                    else sentence.disjuncts)
+        cnfs = [clauses(operand, positive) for operand in operands]
+
+        # Conjunctions, and negated disjunctions, just collect clauses
+        if isinstance(sentence, And) == positive:
+            return [clause for cnf in cnfs for clause in cnf]
+        return disjoin(*cnfs)
+    if isinstance(sentence, Implication):
+        if positive:
+            return disjoin(clauses(sentence.antecedent, False),
+                           clauses(sentence.consequent, True))
+        return (clauses(sentence.antecedent, True)
+                + clauses(sentence.consequent, False))
+    if isinstance(sentence, Biconditional):
+        left, right = sentence.left, sentence.right
+        return (disjoin(clauses(left, False), clauses(right, positive))
+                + disjoin(clauses(left, True), clauses(right, not positive)))
+    raise TypeError("must be a logical sentence")
+
+
+class ClauseSet():
+    """
+    Set of clauses with a literal to clause index, which keeps itself
+    small by discarding clauses subsumed by others.
+    """
+
+    def __init__(self):
+        self.clauses = set()
+        self.index = dict()
+
+    def __contains__(self, clause):
+        return clause in self.clauses
+
+    def subsumed(self, clause):
+        """Checks if some clause in the set is a subset of clause."""
+        return any(
+            other <= clause
+            for literal in clause
+            for other in self.index.get(literal, ())
+        )
+
+    def add(self, clause):
+        """
+        Adds clause to the set, removing clauses it subsumes.
+        Returns the set of removed clauses.
+        """
+
+        # Any superset of clause must contain its least common literal
+        removed = set()
+        if clause:
+            rarest = min(clause, key=lambda l: len(self.index.get(l, ())))
+            removed = {
+                other for other in self.index.get(rarest, ())
+                if clause < other
+            }
+        for other in removed:
+            self.remove(other)
+
+        self.clauses.add(clause)
+        for literal in clause:
+            self.index.setdefault(literal, set()).add(clause)
+        return removed
+
+    def remove(self, clause):
+        self.clauses.remove(clause)
+        for literal in clause:
+            self.index[literal].discard(clause)
+
+    def resolvents(self, clause):
+        """Yields every resolvent of clause with a clause in the set."""
+        for name, value in clause:
+            for other in self.index.get((name, not value), ()):
+                resolvent = (clause - {(name, value)}) | (
+                    other - {(name, not value)}
+                )
+                if not any((n, not v) in resolvent for n, v in resolvent):
+                    yield resolvent
+
+
+def resolution_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, by resolution refutation.
+
+    Clauses of the knowledge base are usable, and clauses of the negated
+    query form the set of support. Each step takes the shortest clause in
+    the set of support and resolves it against the usable clauses only, so
+    every resolvent derives from the query. Resolvents subsumed by an
+    existing clause are dropped, and existing clauses subsumed by a new
+    resolvent are removed.
+    """
+
+    # All clauses kept, and those that have been resolved against
+    kept = ClauseSet()
+    usable = ClauseSet()
+    for clause in clauses(knowledge):
+        if not kept.subsumed(clause):
+            for other in kept.add(clause):
+                usable.remove(other)
+            usable.add(clause)
+
+    # Set of support, shortest clause first
+    support = []
+    counter = itertools.count()
+    for clause in clauses(query, False):
+        if not kept.subsumed(clause):
+            kept.add(clause)
+            heapq.heappush(support, (len(clause), next(counter), clause))
+
+    while support:
+        _, _, given = heapq.heappop(support)
+
+        # Skip clauses subsumed since they were added
+        if given not in kept:
+            continue
+        if not given:
+            return True
+        usable.add(given)
+
+        for resolvent in list(usable.resolvents(given)):
+            if not resolvent:
+                return True
+            if kept.subsumed(resolvent):
+                continue
+            for clause in kept.add(resolvent):
+                if clause in usable:
+                    usable.remove(clause)
+            heapq.heappush(
+                support, (len(resolvent), next(counter), resolvent)
+            )
+
+    # Set of support is only complete for a satisfiable knowledge base,
+    # and an unsatisfiable one entails anything
+    return not satisfiable(knowledge)
+
+
+def satisfiable(knowledge):
+    """Checks if there is a model in which knowledge base is true."""
+
+    def check(model):
+        """Stops the search at the first model of knowledge base."""
+        value = knowledge.evaluate_partial(model)
+        return None if value is None else not value
+
+    return not search(sorted(knowledge.symbols()), dict(), check)
@@ -1,5 +1,19 @@
 import itertools
+import json
+import logging
+import math
 import random
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Largest frontier, in cells, for which mine probabilities are exact
+EXACT_FRONTIER = 200
 
 
 class Minesweeper():
@@ -84,6 +98,108 @@ class Minesweeper():
         return self.mines_found == self.mines
 
 
+class LargeMinesweeper():
+    """
+    Minesweeper game representation for very large boards, backed by
+    NumPy arrays. Mines are placed on the first reveal, away from the
+    revealed cell, and revealing a cell with no neighboring mines
+    reveals the whole region around it.
+    """
+
+    def __init__(self, height=1000, width=1000, mines=150000, seed=None):
+        if np is None:
+            raise ImportError("LargeMinesweeper requires numpy")
+
+        # Set initial width, height, and number of mines
+        self.height = height
+        self.width = width
+        self.mine_count = mines
+        self.rng = np.random.default_rng(seed)
+
+        # Mines are placed once the first cell is revealed
+        self.board = np.zeros((height, width), dtype=bool)
+        self.counts = np.zeros((height, width), dtype=np.int8)
+        self.revealed = np.zeros((height, width), dtype=bool)
+        self.placed = False
+
+        # At first, player has found no mines
+        self.mines_found = set()
+
+    @property
+    def mines(self):
+        """
+        Set of all cells containing mines.
+        """
+        return set(zip(*(x.tolist() for x in np.nonzero(self.board))))
+
+    def place_mines(self, cell):
+        """
+        Places mines at random, outside of cell and its neighbors
+        if there is room, and counts every cell's neighboring mines.
+        """
+        i, j = cell
+        excluded = np.zeros((self.height, self.width), dtype=bool)
+        excluded[max(0, i-1):i+2, max(0, j-1):j+2] = True
+        if self.height * self.width - excluded.sum() < self.mine_count:
+            excluded[:] = False
+            excluded[i, j] = True
+        candidates = np.flatnonzero(~excluded)
+        chosen = self.rng.permutation(candidates)[:self.mine_count]
+        self.board.flat[chosen] = True
+
+        # Sum the 8 shifted copies of the padded board
+        padded = np.pad(self.board, 1).astype(np.int8)
+        self.counts = sum(
+            padded[1+di:1+di+self.height, 1+dj:1+dj+self.width]
+            for di in (-1, 0, 1) for dj in (-1, 0, 1)
+            if (di, dj) != (0, 0)
+        ).astype(np.int8)
+        self.placed = True
+
+    def is_mine(self, cell):
+        i, j = cell
+        return bool(self.board[i, j])
+
+    def nearby_mines(self, cell):
+        """
+        Returns the number of mines that are
+        within one row and column of a given cell,
+        not including the cell itself.
+        """
+        i, j = cell
+        return int(self.counts[i, j])
+
+    def reveal(self, cell):
+        """
+        Reveals a safe cell, and if it has no neighboring mines, every cell
+        reachable through other cells with no neighboring mines.
+        Returns a list of (cell, count) pairs for the newly revealed cells.
+        """
+        if not self.placed:
+            self.place_mines(cell)
+        revealed = []
+        stack = [cell]
+        self.revealed[cell] = True
+        while stack:
+            i, j = stack.pop()
+            count = int(self.counts[i, j])
+            revealed.append(((i, j), count))
+            if count:
+                continue
+            for a in range(max(0, i-1), min(i+2, self.height)):
+                for b in range(max(0, j-1), min(j+2, self.width)):
+                    if not self.revealed[a, b]:
+                        self.revealed[a, b] = True
+                        stack.append((a, b))
+        return revealed
+
+    def won(self):
+        """
+        Checks if all mines have been flagged.
+        """
+        return self.mines_found == self.mines
+
+
 class Sentence():
     """
     Logical statement about a Minesweeper game
@@ -99,11 +215,47 @@ class Sentence():
         return self.cells == other.cells and self.count == other.count
 
     def __hash__(self):
-        return hash((tuple(self.cells), self.count))
+        return hash(self.key())
+
+    def __len__(self):
+        return len(self.cells)
 
     def __str__(self):
         return f"{self.cells} = {self.count}"
 
+    def key(self):
+        """
+        Returns a hashable value identifying the sentence's cells and count.
+        """
+        return (frozenset(self.cells), self.count)
+
+    def is_proper_subset(self, other):
+        """
+        Returns True if self's cells are a proper subset of other's cells.
+        """
+        return self.cells < other.cells
+
+    def difference(self, other):
+        """
+        Returns the sentence inferred by removing other's cells and mines
+        from self, when other's cells are a subset of self's.
+        """
+        return Sentence(self.cells - other.cells, self.count - other.count)
+
+    def clear(self):
+        """
+        Removes every cell from the sentence.
+        """
+        self.cells = set()
+        self.count = 0
+
+    def positions(self):
+        """
+        Returns the keys of the sentence's cells in a MinesweeperAI's
+        index, which for Sentence are the cells themselves.
+        """
+        return self.cells
+
     def known_mines(self):
         """
         Returns the set of all cells in self.cells known to be mines.
@@ -143,16 +295,256 @@ class Sentence():
             return 1
         return 0
 
+
+class BitSentence():
+    """
+    Compact logical statement about a Minesweeper game, equivalent to
+    Sentence but storing its cells as an integer bitmask. Cell (i, j) has
+    position i * width + j, and bit k of the mask is set for the cell at
+    position offset + k, where offset is the position of the first cell,
+    so masks stay small on large boards. Subset tests and differences
+    are then a shift and a few integer operations.
+    """
+
+    __slots__ = ("offset", "mask", "count", "width")
+
+    def __init__(self, cells, count, width):
+        positions = [i * width + j for i, j in cells]
+        self.offset = min(positions, default=0)
+        self.mask = 0
+        for position in positions:
+            self.mask |= 1 << (position - self.offset)
+        self.count = count
+        self.width = width
+
+    @classmethod
+    def from_mask(cls, mask, count, width, offset=0):
+        sentence = cls.__new__(cls)
+        sentence.offset = offset
+        sentence.mask = mask
+        sentence.count = count
+        sentence.width = width
+        sentence.align()
+        return sentence
+
+    def __eq__(self, other):
+        return self.key() == other.key()
+
+    def __hash__(self):
+        return hash(self.key())
+
+    def __bool__(self):
+        return self.mask != 0
+
+    def __len__(self):
+        return self.mask.bit_count()
+
+    def __str__(self):
+        return f"{self.cells} = {self.count}"
+
+    @property
+    def cells(self):
+        """
+        Set of cells in the sentence, decoded from its bitmask.
+        """
+        return {
+            divmod(position, self.width) for position in self.positions()
+        }
+
+    def align(self):
+        """
+        Shifts the mask so that its lowest bit is the first cell, with an
+        offset of 0 if there are no cells.
+        """
+        if self.mask & 1:
+            return
+        if not self.mask:
+            self.offset = 0
+            return
+        shift = (self.mask & -self.mask).bit_length() - 1
+        self.mask >>= shift
+        self.offset += shift
+
+    def key(self):
+        """
+        Returns a hashable value identifying the sentence's cells and count.
+        """
+        return (self.offset, self.mask, self.count)
+
+    def is_proper_subset(self, other):
+        """
+        Returns True if self's cells are a proper subset of other's cells.
+        """
+        if self.offset < other.offset:
+            return False
+        mask = self.mask << (self.offset - other.offset)
+        return mask != other.mask and mask & ~other.mask == 0
+
+    def difference(self, other):
+        """
+        Returns the sentence inferred by removing other's cells and mines
+        from self, when other's cells are a subset of self's.
+        """
+        return BitSentence.from_mask(
+            self.mask & ~(other.mask << (other.offset - self.offset)),
+            self.count - other.count, self.width, self.offset
+        )
+
+    def clear(self):
+        """
+        Removes every cell from the sentence.
+        """
+        self.offset = 0
+        self.mask = 0
+        self.count = 0
+
+    def positions(self):
+        """
+        Returns a list of the keys of the sentence's cells in a
+        MinesweeperAI's index, which for BitSentence are their positions.
+        """
+        positions = []
+        mask = self.mask
+        while mask:
+            low = mask & -mask
+            positions.append(self.offset + low.bit_length() - 1)
+            mask ^= low
+        return positions
+
+    def known_mines(self):
+        """
+        Returns the set of all cells in the sentence known to be mines.
+        """
+        if self.mask and self.mask.bit_count() == self.count:
+            return self.cells
+        else:
+            return set()
+
+    def known_safes(self):
+        """
+        Returns the set of all cells in the sentence known to be safe.
+        """
+        if self.mask and self.count == 0:
+            return self.cells
+        else:
+            return set()
+
+    def mark_mine(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be a mine.
+        """
+        shift = cell[0] * self.width + cell[1] - self.offset
+        if shift >= 0 and self.mask >> shift & 1:
+            self.mask ^= 1 << shift
+            self.count -= 1
+            if not shift:
+                self.align()
+            return 1
+        return 0
+
+    def mark_safe(self, cell):
+        """
+        Updates internal knowledge representation given the fact that
+        a cell is known to be safe.
+        """
+        shift = cell[0] * self.width + cell[1] - self.offset
+        if shift >= 0 and self.mask >> shift & 1:
+            self.mask ^= 1 << shift
+            if not shift:
+                self.align()
+            return 1
+        return 0
+
+
+class InferenceStats():
+    """
+    Counters and timers for a MinesweeperAI's inference, optionally
+    writing one JSON line per move to a trace file.
+    """
+
+    # Phases of inference that are timed
+    PHASES = ("add_knowledge", "update_self_and_sentences", "new_inferences")
+
+    def __init__(self, trace=None):
+        self.moves = 0
+        self.rounds = 0
+        self.sentences_added = 0
+        self.sentences_removed = 0
+        self.comparisons = 0
+        self.seconds = dict.fromkeys(self.PHASES, 0)
+
+        # Open file to write a line to after each move, if any
+        self.trace = trace
+        self.last = None
+
+    def as_dict(self):
+        """
+        Returns the counters and timers as a dictionary.
+        """
+        return {
+            "moves": self.moves,
+            "rounds": self.rounds,
+            "sentences_added": self.sentences_added,
+            "sentences_removed": self.sentences_removed,
+            "comparisons": self.comparisons,
+            "seconds": dict(self.seconds)
+        }
+
+    def add(self, other):
+        """
+        Adds the counters and timers of other to these.
+        """
+        self.moves += other.moves
+        self.rounds += other.rounds
+        self.sentences_added += other.sentences_added
+        self.sentences_removed += other.sentences_removed
+        self.comparisons += other.comparisons
+        for phase in self.PHASES:
+            self.seconds[phase] += other.seconds[phase]
+
+    def end_move(self, cells, knowledge):
+        """
+        Records the end of a move revealing cells, writing what changed
+        since the previous move to the trace file, if any.
+        """
+        self.moves += 1
+        if self.trace is None:
+            return
+        current = self.as_dict()
+        last = self.last or InferenceStats().as_dict()
+        line = {
+            key: current[key] - last[key]
+            for key in current if key != "seconds"
+        }
+        line["seconds"] = {
+            phase: current["seconds"][phase] - last["seconds"][phase]
+            for phase in self.PHASES
+        }
+        line["cells"] = [list(cell) for cell in cells]
+        line["knowledge"] = knowledge
+        self.trace.write(json.dumps(line) + "\n")
+        self.last = current
+
+
 class MinesweeperAI():
     """
     Minesweeper game player
     """
 
-    def __init__(self, height=8, width=8):
+    def __init__(self, height=8, width=8, mines=8, compact=False,
+                 stats=None):
 
-        # Set initial height and width
+        # Set initial height, width, and total number of mines
         self.height = height
         self.width = width
+        self.mine_count = mines
+
+        # Store sentences as bitmasks rather than sets of cells
+        self.compact = compact
+
+        # InferenceStats to record into, if any
+        self.stats = stats
 
         # Keep track of which cells have been clicked on
         self.moves_made = set()
@@ -161,9 +553,42 @@ class MinesweeperAI():
         self.mines = set()
         self.safes = set()
 
+        # The same cells as a bitmask for each row, for compact sentences
+        if compact:
+            self.mine_rows = [0] * height
+            self.safe_rows = [0] * height
+
         # Set of sentences about the game known to be true
         self.knowledge = []
 
+        # Map from each unknown cell, or its position i * width + j for
+        # compact sentences, to the sentences containing it
+        self.index = dict()
+
+        # Sentences changed since their known safes and mines were checked
+        self.worklist = []
+
+        # Sentences added or shrunk since the last round of inference
+        self.changed = []
+
+        # Map from the key of every sentence ever known
+        # to the sentence that had it first, to skip duplicates
+        self.seen = dict()
+
+        # Number of sentences in knowledge left without any cells
+        self.empty = 0
+
+        # Mine configuration counts for each frontier component,
+        # keyed by the component's sentences
+        self.component_counts = dict()
+
+        # Cells known to be safe that have not been clicked on yet
+        self.safe_moves = set()
+
+        # Index of a cell such that every cell before it, in row-major
+        # order, has been clicked on or is known to be a mine
+        self.scan = 0
+
     def mark_mine(self, cell):
         """
         Marks a cell as a mine, and updates all knowledge
@@ -171,8 +596,18 @@ class MinesweeperAI():
         """
         counter = 0
         self.mines.add(cell)
-        for sentence in self.knowledge:
+        if self.compact:
+            self.mine_rows[cell[0]] |= 1 << cell[1]
+
+        # Once known, a cell is no longer part of any sentence
+        for sentence in self.index.pop(self.position(cell), ()):
             counter += sentence.mark_mine(cell)
+            self.worklist.append(sentence)
+            self.changed.append(sentence)
+            if not sentence:
+                self.empty += 1
+                if self.stats is not None:
+                    self.stats.sentences_removed += 1
         return counter
 
     def mark_safe(self, cell):
@@ -182,10 +617,87 @@ class MinesweeperAI():
         """
         counter = 0
         self.safes.add(cell)
-        for sentence in self.knowledge:
+        if cell not in self.moves_made:
+            self.safe_moves.add(cell)
+        if self.compact:
+            self.safe_rows[cell[0]] |= 1 << cell[1]
+
+        # Once known, a cell is no longer part of any sentence
+        for sentence in self.index.pop(self.position(cell), ()):
             counter += sentence.mark_safe(cell)
+            self.worklist.append(sentence)
+            self.changed.append(sentence)
+            if not sentence:
+                self.empty += 1
+                if self.stats is not None:
+                    self.stats.sentences_removed += 1
         return counter
 
+    def add_sentence(self, sentence):
+        """
+        Adds a sentence to the knowledge base. The sentence must leave out
+        cells already known to be safe or mines, as those from new_sentence
+        do, and as inferences do, being differences of sentences in the
+        knowledge base, which never hold known cells.
+        """
+        if not sentence:
+            return
+
+        self.seen.setdefault(sentence.key(), sentence)
+        self.knowledge.append(sentence)
+        if self.stats is not None:
+            self.stats.sentences_added += 1
+        for position in sentence.positions():
+            self.index.setdefault(position, []).append(sentence)
+        self.worklist.append(sentence)
+        self.changed.append(sentence)
+
+    def new_sentence(self, cell, count):
+        """
+        Returns a sentence that count of the neighbors of cell are mines,
+        in the AI's representation, leaving out any cells already known
+        to be safe or mines.
+        """
+        if self.compact:
+            offset, mask, mines = self.unknown_neighbors(cell)
+            return BitSentence.from_mask(
+                mask, count - mines, self.width, offset
+            )
+        cells = self.neighbors(cell)
+        mines = cells & self.mines
+        return Sentence(cells - mines - self.safes, count - len(mines))
+
+    def position(self, cell):
+        """
+        Returns the key of cell in the index: the cell itself, or its
+        position i * width + j for compact sentences.
+        """
+        if self.compact:
+            return cell[0] * self.width + cell[1]
+        return cell
+
+    def remove_sentence(self, sentence):
+        """
+        Removes a sentence from the index, leaving it empty so that it
+        is dropped from the knowledge base along with other empty ones.
+        """
+        for position in sentence.positions():
+            self.index[position] = [
+                other for other in self.index[position]
+                if other is not sentence
+            ]
+        sentence.clear()
+        self.empty += 1
+        if self.stats is not None:
+            self.stats.sentences_removed += 1
+
+    def knowledge_size(self):
+        """
+        Returns the number of sentences in the knowledge base, not counting
+        empty ones that have not been dropped from it yet.
+        """
+        return len(self.knowledge) - self.empty
+
     def add_knowledge(self, cell, count):
         """
         Called when the Minesweeper board tells us, for a given
@@ -201,32 +713,99 @@ class MinesweeperAI():
             5) add any new sentences to the AI's knowledge base
                if they can be inferred from existing knowledge
         """
+        if self.stats is not None:
+            start = time.perf_counter()
+
         # mark the cell as a move that has been made
         self.moves_made.add(cell)
+        self.safe_moves.discard(cell)
 
         # mark the cell as safe
         self.mark_safe(cell)
 
         # add new sentence
-        # find neighbors
+        self.add_sentence(self.new_sentence(cell, count))
+        self.infer()
+
+        if self.stats is not None:
+            self.stats.seconds["add_knowledge"] += time.perf_counter() - start
+            self.stats.end_move([cell], self.knowledge_size())
+
+    def add_revealed(self, revealed):
+        """
+        Called when the Minesweeper board reveals many safe cells at once,
+        as when clicking a cell with no neighboring mines opens up the
+        region around it. `revealed` is a list of (cell, count) pairs.
+
+        Cells with no neighboring mines only make their neighbors safe,
+        and those are revealed too, so only cells on the edge of the
+        region add sentences to the knowledge base.
+        """
+        if self.stats is not None:
+            start = time.perf_counter()
+
+        for cell, count in revealed:
+            self.moves_made.add(cell)
+            self.safe_moves.discard(cell)
+            self.mark_safe(cell)
+        for cell, count in revealed:
+            if count:
+                self.add_sentence(self.new_sentence(cell, count))
+        self.infer()
+
+        if self.stats is not None:
+            self.stats.seconds["add_knowledge"] += time.perf_counter() - start
+            self.stats.end_move(
+                [cell for cell, _ in revealed], self.knowledge_size()
+            )
+
+    def neighbors(self, cell):
+        """
+        Returns the set of cells within one row and column of cell,
+        not including the cell itself.
+        """
         i, j = cell
         neighbors = set()
         for a in range(max(0, i-1), min(i+2, self.height)):
             for b in range(max(0, j-1), min(j+2, self.width)):
                 if (a, b) != (i, j):
                     neighbors.add((a, b))
-        # add neighbors and value to sentence
-        self.knowledge.append(Sentence(neighbors, count))
+        return neighbors
+
+    def unknown_neighbors(self, cell):
+        """
+        Returns the cells within one row and column of cell that are not
+        known to be safe or mines, for compact sentences, as a tuple of the
+        position of the first row's first cell, a bitmask of cells relative
+        to it as in BitSentence, and the number of known mines left out.
+        """
+        i, j = cell
+        top = max(0, i-1)
+        left = max(0, j-1)
+        columns = (1 << (min(j+2, self.width) - left)) - 1
+        mask = 0
+        mines = 0
+        for a in range(top, min(i+2, self.height)):
+            row_mines = self.mine_rows[a] >> left & columns
+            known = row_mines | self.safe_rows[a] >> left
+            mines += row_mines.bit_count()
+            mask |= (columns & ~known) << ((a - top) * self.width)
+        mask &= ~(1 << ((i - top) * self.width + j - left))
+        return top * self.width + left, mask, mines
 
+    def infer(self):
+        """
+        Marks cells as safe or mines, and adds new sentences to the
+        knowledge base, until nothing more can be concluded.
+        """
         # mark additional cells as safe or mines
         self.update_self_and_sentences()
 
-
         inferences = self.new_inferences()
 
         while inferences:
             for sentence in inferences:
-                self.knowledge.append(sentence)
+                self.add_sentence(sentence)
 
             # mark additional cells as safe or mines
             self.update_self_and_sentences()
@@ -244,10 +823,9 @@ class MinesweeperAI():
         This function may use the knowledge in self.mines, self.safes
         and self.moves_made, but should not modify any of those values.
         """
-        for move in self.safes:
-            if move not in self.moves_made and move not in self.mines:
-                self.print_data()
-                return move
+        for move in self.safe_moves:
+            self.print_data()
+            return move
 
         return None
 
@@ -267,56 +845,418 @@ class MinesweeperAI():
 
         return None
 
+    def make_probable_move(self):
+        """
+        Returns the move on the Minesweeper board least likely to be a mine,
+        among cells that have not already been chosen and are not known to
+        be mines, or None if there are no such cells.
+        Ties are broken in favor of the first cell in row-major order.
+        """
+        probabilities, interior, density = self.frontier_probabilities()
+        best = min(
+            probabilities, key=lambda cell: (probabilities[cell], cell),
+            default=None
+        )
+        if interior and (best is None or density <= probabilities[best]):
+            cell = self.first_interior(probabilities)
+            if best is None or (density, cell) < (probabilities[best], best):
+                best = cell
+        if best is not None:
+            self.print_data()
+        return best
+
+    def first_interior(self, frontier):
+        """
+        Returns the first cell, in row-major order, that has not been
+        chosen, is not known to be safe or a mine, and is not in frontier.
+        """
+        cells = self.height * self.width
+        while (self.scan < cells
+               and (divmod(self.scan, self.width) in self.moves_made
+                    or divmod(self.scan, self.width) in self.mines)):
+            self.scan += 1
+        for index in range(self.scan, cells):
+            cell = divmod(index, self.width)
+            if (cell not in self.moves_made and cell not in self.mines
+                    and cell not in self.safe_moves and cell not in frontier):
+                return cell
+        return None
+
+    def mine_probabilities(self):
+        """
+        Returns a dictionary mapping each cell that has not been chosen and
+        is not known to be a mine to the probability that it is a mine.
+        """
+        probabilities, interior, density = self.frontier_probabilities()
+        if interior:
+            for i in range(self.height):
+                for j in range(self.width):
+                    cell = (i, j)
+                    if (cell not in probabilities
+                            and cell not in self.moves_made
+                            and cell not in self.mines):
+                        probabilities[cell] = density
+        return probabilities
+
+    def frontier_probabilities(self):
+        """
+        Returns a tuple of a dictionary mapping each cell in the knowledge
+        base, or known safe and not chosen, to the probability that it is a
+        mine, the number of other cells neither chosen nor known to be
+        mines, and the probability that each of those is a mine.
+
+        Cells in the knowledge base are split into independent components of
+        sentences sharing cells, and consistent mine configurations are
+        counted for each component. Combined with the number of ways to
+        place the remaining mines in cells no sentence covers, these counts
+        give the exact probability of each cell, assuming every arrangement
+        consistent with the knowledge base is equally likely.
+
+        Frontiers of more than EXACT_FRONTIER cells, as on very large
+        boards, treat each component as independent, with the odds of a
+        mine set by the density of remaining mines.
+        """
+
+        # Count configurations in each component, reusing previous counts
+        components = []
+        counts = dict()
+        for component in self.components():
+            key = frozenset(sentence.key() for sentence in component)
+            if key not in self.component_counts:
+                self.component_counts[key] = count_configurations(
+                    (sentence.cells, sentence.count) for sentence in component
+                )
+            counts[key] = self.component_counts[key]
+            components.append(counts[key])
+        self.component_counts = counts
+
+        frontier = sum(len(cell_totals) for _, cell_totals in components)
+        interior = (self.height * self.width - len(self.moves_made)
+                    - len(self.mines) - len(self.safe_moves) - frontier)
+        remaining = self.mine_count - len(self.mines)
+        probabilities = dict.fromkeys(self.safe_moves, 0)
+
+        def log_ways(count, mines):
+            """
+            Returns the log of the number of ways to complete a board from
+            count frontier configurations with the given number of mines,
+            or None if the remaining mines don't fit in the interior.
+            """
+            left = remaining - mines
+            if not count or not 0 <= left <= interior:
+                return None
+            return (math.log(count) + math.lgamma(interior + 1)
+                    - math.lgamma(left + 1) - math.lgamma(interior - left + 1))
+
+        # Combine components by convolving their counts
+        if frontier <= EXACT_FRONTIER:
+            everything = convolve([totals for totals, _ in components])
+            logs = {
+                mines: log_ways(count, mines)
+                for mines, count in everything.items()
+            }
+            logs = {mines: x for mines, x in logs.items() if x is not None}
+        if frontier <= EXACT_FRONTIER and logs:
+            scale = max(logs.values())
+            weights = {
+                mines: math.exp(x - scale) for mines, x in logs.items()
+            }
+            total = sum(weights.values())
+
+            # Convolution of all other components, from prefixes and suffixes
+            prefixes = [{0: 1}]
+            for totals, _ in components:
+                prefixes.append(convolve([prefixes[-1], totals]))
+            suffix = {0: 1}
+            for k in reversed(range(len(components))):
+                totals, cell_totals = components[k]
+                others = convolve([prefixes[k], suffix])
+                suffix = convolve([totals, suffix])
+
+                # Weight of this component having each number of mines
+                weight = dict()
+                for mines in totals:
+                    terms = [
+                        log_ways(count, mines + other_mines)
+                        for other_mines, count in others.items()
+                    ]
+                    weight[mines] = sum(
+                        math.exp(x - scale) for x in terms if x is not None
+                    ) / total
+                for cell, mine_totals in cell_totals.items():
+                    probabilities[cell] = sum(
+                        n * weight[mines] for mines, n in mine_totals.items()
+                    )
+
+            density = 0
+            if interior:
+                density = sum(
+                    weights[mines] * (remaining - mines)
+                    for mines in weights
+                ) / (total * interior)
+
+        else:
+            # Each cell outside known mines and safes is a mine with odds
+            # set by the density of remaining mines
+            unknown = interior + frontier
+            density = min(max(remaining / unknown, 0), 1) if unknown else 0
+            odds = math.log(max(density, 1e-12) / max(1 - density, 1e-12))
+            expected = 0
+            for totals, cell_totals in components:
+                if not totals:
+                    continue
+
+                # Weigh each number of mines relative to the likeliest
+                reference = min(totals) if odds < 0 else max(totals)
+                weight = {
+                    mines: math.exp((mines - reference) * odds)
+                    for mines in totals
+                }
+                total = sum(weight[mines] * totals[mines] for mines in weight)
+                for cell, mine_totals in cell_totals.items():
+                    probabilities[cell] = sum(
+                        n * weight[mines] for mines, n in mine_totals.items()
+                    ) / total
+                expected += sum(
+                    mines * weight[mines] * totals[mines] for mines in weight
+                ) / total
+            if interior:
+                density = min(max((remaining - expected) / interior, 0), 1)
+
+        return probabilities, interior, density
+
+    def components(self):
+        """
+        Returns a list of the independent components of the knowledge base,
+        each a list of sentences connected to one another by shared cells.
+        """
+        components = []
+        visited = set()
+        for position in self.index:
+            if position in visited:
+                continue
+            visited.add(position)
+            queue = [position]
+            sentences = dict()
+            while queue:
+                for sentence in self.index[queue.pop()]:
+                    if id(sentence) in sentences:
+                        continue
+                    sentences[id(sentence)] = sentence
+                    for other in sentence.positions():
+                        if other not in visited:
+                            visited.add(other)
+                            queue.append(other)
+            components.append(list(sentences.values()))
+        return components
+
     def print_data(self):
-        print("Mines: ", self.mines)
-        print("Knowlege: ")
+        """
+        Logs known mines and the knowledge base at debug level.
+        Does nothing unless debug logging is enabled.
+        """
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug("Mines: %s", self.mines)
+        logger.debug("Knowlege: ")
         for sentence in self.knowledge:
-            print("\t", sentence.cells, " = ", sentence.count)
+            logger.debug("\t %s = %s", sentence.cells, sentence.count)
 
     def new_inferences(self):
+        if self.stats is not None:
+            start = time.perf_counter()
         inferences = []
-        removals = []
+        comparisons = 0
+
+        # compare each sentence added or shrunk since the last round
+        # only with the sentences it shares a cell with
+        changed, self.changed = self.changed, []
+        compared = set()
+        for sentence1 in changed:
+            if id(sentence1) in compared or not sentence1:
+                continue
+            compared.add(id(sentence1))
 
-        # for each sentence known
-        for sentence1 in self.knowledge:
-            # mark for removal if it is empty
-            if sentence1.cells == set():
-                removals.append(sentence1)
+            # a sentence that shrank into another one is redundant
+            key = sentence1.key()
+            other = self.seen.setdefault(key, sentence1)
+            if other is not sentence1 and other == sentence1:
+                self.remove_sentence(sentence1)
                 continue
-            # pick another
-            for sentence2 in self.knowledge:
-                # mark for removal if empty
-                if sentence2.cells == set():
-                    removals.append(sentence2)
+            self.seen[key] = sentence1
+
+            neighbors = {
+                id(sentence2): sentence2
+                for position in sentence1.positions()
+                for sentence2 in self.index[position]
+                if sentence2 is not sentence1
+            }
+            comparisons += len(neighbors)
+            for sentence2 in neighbors.values():
+                # if one is a proper subset of the other,
+                # their difference is an inference
+                if sentence2.is_proper_subset(sentence1):
+                    inference = sentence1.difference(sentence2)
+                elif sentence1.is_proper_subset(sentence2):
+                    inference = sentence2.difference(sentence1)
+                else:
                     continue
-                # make sure they're different sentences
-                if sentence1 != sentence2:
-                    # if s2 is a subset of s1
-                    if sentence2.cells.issubset(sentence1.cells):
-                        diff_cells = sentence1.cells.difference(sentence2.cells)
-                        diff_count = sentence1.count - sentence2.count
-                        # an inference can be drawn
-                        new_inference = Sentence(diff_cells, diff_count)
-                        if new_inference not in self.knowledge:
-                            inferences.append(new_inference)
-
-        # remove sentences without any cells
-        self.knowledge = [x for x in self.knowledge if x not in removals]
+                if inference.key() not in self.seen:
+                    self.seen[inference.key()] = inference
+                    inferences.append(inference)
+
+        # remove sentences without any cells, once they make up half
+        if self.empty * 2 > len(self.knowledge):
+            self.knowledge = [x for x in self.knowledge if x]
+            self.empty = 0
+
+        if self.stats is not None:
+            self.stats.comparisons += comparisons
+            self.stats.seconds["new_inferences"] += (
+                time.perf_counter() - start
+            )
         return inferences
 
     def update_self_and_sentences(self):
-        # repeat update if an update was made in the previous cycle
-        counter = 1
-        while counter:
-            counter = 0
-            for sentence in self.knowledge:
-                for cell in sentence.known_safes():
-                    self.mark_safe(cell)
-                    counter += 1
-                for cell in sentence.known_mines():
-                    self.mark_mine(cell)
-                    counter += 1
-            for cell in self.safes:
-                counter += self.mark_safe(cell)
-            for cell in self.mines:
-                counter += self.mark_mine(cell)
+        if self.stats is not None:
+            start = time.perf_counter()
+            self.stats.rounds += 1
+
+        # check each changed sentence for cells it has made known,
+        # which in turn adds the sentences containing them
+        while self.worklist:
+            sentence = self.worklist.pop()
+            for cell in sentence.known_safes():
+                self.mark_safe(cell)
+            for cell in sentence.known_mines():
+                self.mark_mine(cell)
+
+        if self.stats is not None:
+            self.stats.seconds["update_self_and_sentences"] += (
+                time.perf_counter() - start
+            )
+
+
+def convolve(distributions):
+    """
+    Returns the distribution of the total number of mines over independent
+    components, given for each component a dictionary mapping a number of
+    mines to a count of configurations.
+    """
+    result = {0: 1}
+    for distribution in distributions:
+        combined = dict()
+        for a, x in result.items():
+            for b, y in distribution.items():
+                combined[a + b] = combined.get(a + b, 0) + x * y
+        result = combined
+    return result
+
+
+def count_configurations(sentences):
+    """
+    Counts mine configurations consistent with a connected set of sentences,
+    given as (cells, count) pairs.
+
+    Returns a tuple of a dictionary mapping each number of mines to the
+    number of configurations with that many mines, and a dictionary
+    mapping each cell to the same counts, restricted to configurations in
+    which that cell is a mine.
+
+    Cells are ordered along the component so that only a few sentences are
+    ever partly assigned at once. Counts are propagated forwards and
+    backwards over that order, with states holding the mines assigned so
+    far in each partly assigned sentence.
+    """
+    sentences = list(sentences)
+
+    # Order cells breadth-first through the sentences that contain them
+    containing = dict()
+    for k, (cells, _) in enumerate(sentences):
+        for cell in cells:
+            containing.setdefault(cell, []).append(k)
+    order = []
+    placed = set()
+    for start in sorted(containing):
+        if start in placed:
+            continue
+        placed.add(start)
+        queue = [start]
+        while queue:
+            cell = queue.pop(0)
+            order.append(cell)
+            for k in containing[cell]:
+                for other in sorted(sentences[k][0]):
+                    if other not in placed:
+                        placed.add(other)
+                        queue.append(other)
+    position = {cell: i for i, cell in enumerate(order)}
+    first = [min(position[cell] for cell in cells) for cells, _ in sentences]
+    last = [max(position[cell] for cell in cells) for cells, _ in sentences]
+
+    # Sentences partly assigned at the boundary before each cell
+    open_at = [
+        [k for k in range(len(sentences)) if first[k] < i <= last[k]]
+        for i in range(len(order) + 1)
+    ]
+
+    def step(i, state, value):
+        """
+        Returns the state after giving cell i value (1 for a mine),
+        or None if that breaks a sentence.
+        """
+        mines = dict(zip(open_at[i], state))
+        for k in containing[order[i]]:
+            mines[k] = mines.get(k, 0) + value
+            cells, count = sentences[k]
+            left = sum(1 for cell in cells if position[cell] > i)
+            if mines[k] > count or mines[k] + left < count:
+                return None
+        return tuple(mines.get(k, 0) for k in open_at[i + 1])
+
+    def shift(distribution, value):
+        return {mines + value: n for mines, n in distribution.items()}
+
+    def add(into, distribution):
+        for mines, n in distribution.items():
+            into[mines] = into.get(mines, 0) + n
+
+    # Forward pass: configurations of the cells before each boundary
+    forward = [{(): {0: 1}}]
+    for i in range(len(order)):
+        layer = dict()
+        for state, distribution in forward[i].items():
+            for value in (0, 1):
+                after = step(i, state, value)
+                if after is not None:
+                    add(layer.setdefault(after, dict()),
+                        shift(distribution, value))
+        forward.append(layer)
+
+    # Backward pass: configurations of the cells after each boundary
+    backward = [None] * len(order) + [{(): {0: 1}}]
+    for i in reversed(range(len(order))):
+        layer = dict()
+        for state in forward[i]:
+            distribution = dict()
+            for value in (0, 1):
+                after = step(i, state, value)
+                if after is not None and after in backward[i + 1]:
+                    add(distribution, shift(backward[i + 1][after], value))
+            if distribution:
+                layer[state] = distribution
+        backward[i] = layer
+
+    # Configurations in which each cell is a mine
+    cell_totals = dict()
+    for i, cell in enumerate(order):
+        mine_totals = dict()
+        for state, distribution in forward[i].items():
+            after = step(i, state, 1)
+            if after is not None and after in backward[i + 1]:
+                add(mine_totals, shift(
+                    convolve([distribution, backward[i + 1][after]]), 1
+                ))
+        cell_totals[cell] = mine_totals
+
+    return backward[0].get((), dict()), cell_totals
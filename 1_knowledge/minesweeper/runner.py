@@ -2,6 +2,8 @@ import pygame
 import sys
 import time
 
+from concurrent.futures import ThreadPoolExecutor
+
 from minesweeper import Minesweeper, MinesweeperAI
 
 HEIGHT = 8
@@ -39,13 +41,44 @@ mine = pygame.transform.scale(mine, (cell_size, cell_size))
 
 # Create game and AI agent
 game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
 
 # Keep track of revealed cells, flagged cells, and if a mine was hit
 revealed = set()
 flags = set()
 lost = False
 
+# AI work runs on a single background thread, in the order it is submitted,
+# so the board keeps drawing while the AI thinks
+worker = ThreadPoolExecutor(max_workers=1)
+thinking = None
+learning = None
+inference_time = 0
+
+
+def choose_move(ai):
+    """
+    Choose the AI's next move, returning the move, whether it is known
+    to be safe, and the time taken in seconds.
+    """
+    start = time.perf_counter()
+    move = ai.make_safe_move()
+    safe = move is not None
+    if move is None:
+        move = ai.make_probable_move()
+    return move, safe, time.perf_counter() - start
+
+
+def learn(ai, move, nearby):
+    """
+    Add knowledge about a revealed move to the AI,
+    returning the time taken in seconds.
+    """
+    start = time.perf_counter()
+    ai.add_knowledge(move, nearby)
+    return time.perf_counter() - start
+
+
 # Show instructions initially
 instructions = True
 
@@ -159,8 +192,40 @@ while True:
     textRect.center = ((5 / 6) * width, (2 / 3) * height)
     screen.blit(text, textRect)
 
+    # Display AI status
+    status = [
+        "Thinking..." if thinking or learning
+        else f"Inference: {inference_time * 1000:.1f} ms",
+        f"Knowledge: {ai.knowledge_size()}"
+    ]
+    for i, line in enumerate(status):
+        line = smallFont.render(line, True, WHITE)
+        lineRect = line.get_rect()
+        lineRect.center = ((5 / 6) * width, (2 / 3) * height + 40 + 30 * i)
+        screen.blit(line, lineRect)
+
     move = None
 
+    # Check if the AI has finished learning from the last move
+    if learning is not None and learning.done():
+        inference_time = learning.result()
+        learning = None
+
+    # Check if the AI has chosen a move
+    if thinking is not None and thinking.done():
+        move, safe, seconds = thinking.result()
+        inference_time = seconds
+        thinking = None
+        if move is None:
+            flags = ai.mines.copy()
+            print("No moves left to make.")
+        elif move in revealed or lost:
+            move = None
+        elif safe:
+            print("AI making safe move", move)
+        else:
+            print("No known safe moves, AI making least likely mine move", move)
+
     left, _, right = pygame.mouse.get_pressed()
     
     # Check for a right-click to toggle flagging
@@ -178,27 +243,23 @@ while True:
     elif left == 1:
         mouse = pygame.mouse.get_pos()
 
-        # If AI button clicked, make an AI move
+        # If AI button clicked, have the AI choose a move in the background
         if aiButton.collidepoint(mouse) and not lost:
-            move = ai.make_safe_move()
-            if move is None:
-                move = ai.make_random_move()
-                if move is None:
-                    flags = ai.mines.copy()
-                    print("No moves left to make.")
-                else:
-                    print("No known safe moves, AI making random move", move)
-            else:
-                print("AI making safe move", move)
+            if thinking is None:
+                thinking = worker.submit(choose_move, ai)
             time.sleep(0.2)
 
         # Reset game state
         elif resetButton.collidepoint(mouse):
             game = Minesweeper(height=HEIGHT, width=WIDTH, mines=MINES)
-            ai = MinesweeperAI(height=HEIGHT, width=WIDTH)
+            ai = MinesweeperAI(height=HEIGHT, width=WIDTH, mines=MINES)
             revealed = set()
             flags = set()
             lost = False
+
+            # Any work still running belongs to the old AI
+            thinking = None
+            learning = None
             continue
 
         # User-made move
@@ -217,6 +278,6 @@ while True:
         else:
             nearby = game.nearby_mines(move)
             revealed.add(move)
-            ai.add_knowledge(move, nearby)
+            learning = worker.submit(learn, ai, move, nearby)
 
     pygame.display.flip()
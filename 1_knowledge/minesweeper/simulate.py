@@ -0,0 +1,159 @@
+import argparse
+import logging
+import multiprocessing
+import random
+import time
+
+from minesweeper import (
+    InferenceStats, LargeMinesweeper, Minesweeper, MinesweeperAI
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Play seeded Minesweeper games with the AI, headless."
+    )
+    parser.add_argument("--games", type=int, default=1000)
+    parser.add_argument("--height", type=int, default=8)
+    parser.add_argument("--width", type=int, default=8)
+    parser.add_argument("--mines", type=int,
+                        help="number of mines (default 8)")
+    parser.add_argument("--density", type=float,
+                        help="fraction of cells that are mines")
+    parser.add_argument("--guess", choices=["probable", "random"],
+                        default="probable",
+                        help="move to make when no move is known to be safe")
+    parser.add_argument("--compact", action="store_true",
+                        help="store the AI's sentences as bitmasks")
+    parser.add_argument("--large", action="store_true",
+                        help="play on a NumPy-backed board with a safe first "
+                             "click and flood reveal")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed of the first game; game i uses seed + i")
+    parser.add_argument("--processes", type=int,
+                        help="worker processes (default one per CPU)")
+    parser.add_argument("--verbose", action="store_true",
+                        help="log the AI's knowledge after every move")
+    parser.add_argument("--stats", action="store_true",
+                        help="count and time the AI's inference")
+    parser.add_argument("--trace", metavar="PATH",
+                        help="write the AI's inference stats for every move "
+                             "to PATH as JSON lines, playing in one process")
+    args = parser.parse_args()
+
+    mines = args.mines
+    if mines is None:
+        mines = (round(args.density * args.height * args.width)
+                 if args.density is not None else 8)
+    if args.verbose:
+        logging.basicConfig(level=logging.DEBUG, format="%(message)s")
+
+    games = [
+        (args.height, args.width, mines, args.guess, args.compact,
+         args.large, args.stats, args.seed + i)
+        for i in range(args.games)
+    ]
+    if args.trace:
+        with open(args.trace, "w") as trace:
+            results = [play(game, trace) for game in games]
+    else:
+        with multiprocessing.Pool(args.processes) as pool:
+            results = pool.map(play, games, chunksize=16)
+
+    wins = sum(result["won"] for result in results)
+    latencies = sorted(t for result in results for t in result["latencies"])
+    sizes = [size for result in results for size in result["sizes"]]
+    print(f"Board: {args.height}x{args.width}, {mines} mines, "
+          f"{args.guess} guesses"
+          + (", compact sentences" if args.compact else "")
+          + (", large board" if args.large else ""))
+    print(f"Win rate: {wins}/{len(results)} ({wins / len(results):.1%})")
+    print(f"Moves: {len(latencies)}")
+    if latencies:
+        print(f"Move latency: p50 {percentile(latencies, 50) * 1000:.3f}ms, "
+              f"p99 {percentile(latencies, 99) * 1000:.3f}ms")
+        print(f"Knowledge size: mean {sum(sizes) / len(sizes):.1f}, "
+              f"max {max(sizes)}")
+
+    # Inference counters and time per phase, summed over games
+    if args.stats or args.trace:
+        stats = InferenceStats()
+        for result in results:
+            stats.add(result["stats"])
+        print(f"Inference: {stats.rounds} rounds, "
+              f"{stats.sentences_added} sentences added, "
+              f"{stats.sentences_removed} removed, "
+              f"{stats.comparisons} subset comparisons")
+        for phase, seconds in stats.seconds.items():
+            print(f"    {phase}: {seconds:.3f}s")
+
+
+def play(game, trace=None):
+    """
+    Play one game, given as a tuple of height, width, number of mines,
+    guessing strategy, whether to use compact sentences, whether to use
+    a large board, whether to record inference stats, and seed. Return a
+    dictionary of whether the AI won, the latency and knowledge base size
+    after each of its moves, and its InferenceStats if recorded.
+
+    If trace is an open file, stats are recorded and written to it
+    after every move.
+    """
+    height, width, mines, guess, compact, large, record, seed = game
+    random.seed(seed)
+    if large:
+        board = LargeMinesweeper(height=height, width=width, mines=mines,
+                                 seed=seed)
+    else:
+        board = Minesweeper(height=height, width=width, mines=mines)
+    stats = InferenceStats(trace) if record or trace else None
+    ai = MinesweeperAI(height=height, width=width, mines=mines,
+                       compact=compact, stats=stats)
+    latencies = []
+    sizes = []
+    revealed = 0
+
+    start = time.perf_counter()
+    while revealed < height * width - mines:
+
+        # Choose a move, as runner.py does for the AI Move button
+        move = ai.make_safe_move()
+        if move is None:
+            move = (ai.make_probable_move() if guess == "probable"
+                    else ai.make_random_move())
+        if move is None or board.is_mine(move):
+            return result(False, latencies, sizes, stats)
+
+        # Time from choosing this move to having learned from it
+        if large:
+            cells = board.reveal(move)
+            ai.add_revealed(cells)
+            revealed += len(cells)
+        else:
+            ai.add_knowledge(move, board.nearby_mines(move))
+            revealed += 1
+        latencies.append(time.perf_counter() - start)
+        sizes.append(ai.knowledge_size())
+        start = time.perf_counter()
+
+    return result(True, latencies, sizes, stats)
+
+
+def result(won, latencies, sizes, stats):
+    """
+    Return the result of a game as a dictionary, without the trace file
+    so that it can be sent back from a worker process.
+    """
+    if stats is not None:
+        stats.trace = None
+    return {"won": won, "latencies": latencies, "sizes": sizes,
+            "stats": stats}
+
+
+def percentile(values, p):
+    """Return the p-th percentile of sorted values, by nearest rank."""
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+if __name__ == "__main__":
+    main()
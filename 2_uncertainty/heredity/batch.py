@@ -0,0 +1,91 @@
+import argparse
+import glob
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+from heredity import (
+	components, inference_engines, load_data, model_tables, solve_family
+)
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Compute gene and trait probabilities for many family "
+					"files, writing one JSON line per file."
+	)
+	parser.add_argument("paths", nargs="+",
+						help="CSV files, directories of them, or glob patterns")
+	parser.add_argument("--engine", default="enumeration",
+						choices=list(inference_engines()))
+	parser.add_argument("--processes", type=int,
+						help="worker processes (default one per CPU)")
+	args = parser.parse_args()
+	filenames = data_files(args.paths)
+
+	# Build the tables before starting workers, so forked workers share
+	# them, and have any other workers build them once each
+	model_tables()
+	tasks = [(args.engine, filename) for filename in filenames]
+	with multiprocessing.Pool(args.processes, initializer=model_tables) as pool:
+		for result in pool.imap_unordered(solve_file, tasks):
+			print(json.dumps(result))
+			sys.stdout.flush()
+
+
+def data_files(paths):
+	"""
+	Return a list of the CSV files named by paths.
+	Directories are expanded to the .csv files directly inside them, and
+	glob patterns to the files they match.
+	"""
+	filenames = []
+	for path in paths:
+		if os.path.isdir(path):
+			filenames.extend(
+				os.path.join(path, filename)
+				for filename in sorted(os.listdir(path))
+				if filename.endswith(".csv")
+			)
+		else:
+			filenames.extend(sorted(glob.glob(path)) or [path])
+	return filenames
+
+
+def solve_file(task):
+	"""
+	Compute gene and trait probabilities for the families in a file, given
+	as a tuple of the name of an inference engine and the filename.
+	Return a dictionary of the filename, the total time in seconds, the
+	people and time in seconds for each family, and each person's
+	probabilities, or of the filename and an error if the file can't be
+	solved.
+	"""
+	engine, filename = task
+	start = time.perf_counter()
+	try:
+		families = components(load_data(filename))
+		timings = []
+		probabilities = dict()
+		for family in families:
+			family_start = time.perf_counter()
+			probabilities.update(solve_family((engine, family)))
+			timings.append({
+				"people": list(family),
+				"seconds": time.perf_counter() - family_start
+			})
+	except (OSError, KeyError, ValueError) as e:
+		return {"file": filename, "error": f"{type(e).__name__}: {e}"}
+
+	return {
+		"file": filename,
+		"seconds": time.perf_counter() - start,
+		"families": timings,
+		"probabilities": probabilities
+	}
+
+
+if __name__ == "__main__":
+	main()
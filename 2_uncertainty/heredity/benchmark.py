@@ -0,0 +1,100 @@
+import csv
+import json
+import random
+import sys
+import time
+
+from generate import generate_pedigree
+from heredity import components, inference_engines, solve_families
+
+# Pedigrees timed per size
+PEDIGREES = 3
+
+# Generations in each pedigree, or as many as fit in smaller ones, and
+# fraction of people with known traits
+GENERATIONS = 4
+EVIDENCE = 0.5
+
+# Largest family that engines enumerating every assignment are timed on
+ENUMERATION_LIMIT = 10
+
+# Engines that enumerate every assignment
+ENUMERATING = ["enumeration", "vectorized"]
+
+
+def main():
+
+	# Check for proper usage
+	if len(sys.argv) not in [2, 3]:
+		sys.exit("Usage: python benchmark.py report.json|report.csv [max]")
+	report = sys.argv[1]
+	largest = int(sys.argv[2]) if len(sys.argv) == 3 else 128
+
+	engines = list(inference_engines())
+	rng = random.Random(0)
+	results = []
+	size = 4
+	while size <= largest:
+		generations = min(GENERATIONS, (size + 1) // 2)
+		pedigrees = [
+			generate_pedigree(size, generations, EVIDENCE, rng)
+			for _ in range(PEDIGREES)
+		]
+		families = [components(people) for people in pedigrees]
+		biggest = max(len(family) for f in families for family in f)
+
+		# Check every engine against exact inference on a junction tree
+		reference = [
+			solve_families(f, "elimination", processes=1) for f in families
+		]
+		for name in engines:
+			if name in ENUMERATING and biggest > ENUMERATION_LIMIT:
+				continue
+			seconds, error = time_engine(name, families, reference)
+			results.append({
+				"engine": name,
+				"people": size,
+				"largest_family": biggest,
+				"seconds": seconds,
+				"error": error
+			})
+			print(f"{name:>12} {size:>5} people: {seconds:.4f}s, "
+				  f"max error {error:.2e}")
+		size *= 2
+
+	# Write report in the format given by its extension
+	with open(report, "w") as f:
+		if report.endswith(".csv"):
+			writer = csv.DictWriter(f, fieldnames=list(results[0]))
+			writer.writeheader()
+			writer.writerows(results)
+		else:
+			json.dump(results, f, indent=4)
+
+
+def time_engine(name, families, reference):
+	"""
+	Time the named engine on each pedigree, given as its list of families.
+	Return a tuple of the mean time in seconds per pedigree, and the
+	largest difference between any probability it computed and the
+	reference probabilities for that pedigree.
+	"""
+	total = 0
+	error = 0
+	for pedigree, expected in zip(families, reference):
+		start = time.perf_counter()
+		probabilities = solve_families(pedigree, name, processes=1)
+		total += time.perf_counter() - start
+
+		error = max(error, max(
+			abs(probabilities[person][field][value]
+				- expected[person][field][value])
+			for person in expected
+			for field in expected[person]
+			for value in expected[person][field]
+		))
+	return total / len(families), error
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,318 @@
+import itertools
+
+from heredity import marginals, model_tables
+
+# Possible numbers of copies of the gene a person can have
+GENES = (0, 1, 2)
+
+
+class Factor():
+	"""
+	A function of the gene counts of some people, stored as a table
+	mapping each tuple of their gene counts to a nonnegative number.
+	"""
+
+	def __init__(self, variables, table):
+		self.variables = tuple(variables)
+		self.table = table
+
+	def __repr__(self):
+		return f"Factor({self.variables!r}, {self.table!r})"
+
+
+def combine(factors, keep):
+	"""
+	Multiply factors together and sum out every variable not in keep,
+	returning a Factor over the variables of keep, in that order.
+	Variables of keep that no factor mentions are left uniform.
+	"""
+	keep = tuple(keep)
+	variables = list(dict.fromkeys(
+		itertools.chain(keep, *(factor.variables for factor in factors))
+	))
+	positions = [
+		[variables.index(variable) for variable in factor.variables]
+		for factor in factors
+	]
+	kept = range(len(keep))
+
+	table = dict.fromkeys(itertools.product(GENES, repeat=len(keep)), 0)
+	for assignment in itertools.product(GENES, repeat=len(variables)):
+		value = 1
+		for factor, position in zip(factors, positions):
+			value *= factor.table[tuple(assignment[i] for i in position)]
+			if not value:
+				break
+		if value:
+			table[tuple(assignment[i] for i in kept)] += value
+	return Factor(keep, table)
+
+
+def scaled(factor):
+	"""
+	Return factor scaled so its table sums to 1. Messages are scaled as
+	they are passed, so that products over large families don't underflow.
+	"""
+	total = sum(factor.table.values())
+	table = {
+		assignment: value / total for assignment, value in factor.table.items()
+	}
+	return Factor(factor.variables, table)
+
+
+def person_factor(people, person, tables):
+	"""
+	Return the Factor for person's gene count, given their parents' gene
+	counts if they have parents, times the likelihood of their trait if
+	it is known. Unknown traits sum to 1 and are left out.
+	"""
+	mother = people[person]["mother"]
+	father = people[person]["father"]
+	trait = people[person]["trait"]
+
+	if mother is None and father is None:
+		variables = (person,)
+		if trait is None:
+			table = {(genes,): tables["gene"][genes] for genes in GENES}
+		else:
+			table = {
+				(genes,): tables["founder"][genes][trait] for genes in GENES
+			}
+	else:
+		variables = (person, mother, father)
+		if trait is None:
+			table = {
+				(genes, m, f): tables["inheritance"][m][f][genes]
+				for genes, m, f in itertools.product(GENES, repeat=3)
+			}
+		else:
+			table = {
+				(genes, m, f): tables["child"][m][f][genes][trait]
+				for genes, m, f in itertools.product(GENES, repeat=3)
+			}
+	return Factor(variables, table)
+
+
+def elimination_order(factors):
+	"""
+	Return an order in which to eliminate the variables of factors,
+	greedily choosing the variable that adds the fewest new edges
+	between its neighbors, then the one with the fewest neighbors.
+	"""
+	neighbors = dict()
+	for factor in factors:
+		for variable in factor.variables:
+			neighbors.setdefault(variable, set()).update(factor.variables)
+	for variable in neighbors:
+		neighbors[variable].discard(variable)
+
+	def fill(variable):
+		return sum(
+			1 for a, b in itertools.combinations(neighbors[variable], 2)
+			if b not in neighbors[a]
+		)
+
+	order = []
+	while neighbors:
+		variable = min(
+			neighbors,
+			key=lambda v: (fill(v), len(neighbors[v]), v)
+		)
+		for a, b in itertools.combinations(neighbors[variable], 2):
+			neighbors[a].add(b)
+			neighbors[b].add(a)
+		for neighbor in neighbors[variable]:
+			neighbors[neighbor].discard(variable)
+		del neighbors[variable]
+		order.append(variable)
+	return order
+
+
+def elimination_tree(factors, order):
+	"""
+	Build a junction tree by eliminating variables in order.
+
+	Eliminating a variable makes a clique of it and its neighbors at the
+	time; the clique's separator is the rest of the clique, and its parent
+	is the clique of the separator variable eliminated next. Each factor
+	is assigned to the clique of its first eliminated variable.
+	Return a tuple of dictionaries mapping each variable to its separator
+	and its parent (None at a root), and a list of the clique each factor
+	is assigned to.
+	"""
+	position = {variable: i for i, variable in enumerate(order)}
+	neighbors = {variable: set() for variable in order}
+	for factor in factors:
+		for variable in factor.variables:
+			neighbors[variable].update(factor.variables)
+	for variable in order:
+		neighbors[variable].discard(variable)
+
+	separator = dict()
+	parent = dict()
+	for variable in order:
+		separator[variable] = tuple(
+			sorted(neighbors[variable], key=position.get)
+		)
+		parent[variable] = (
+			separator[variable][0] if separator[variable] else None
+		)
+		for a, b in itertools.combinations(neighbors[variable], 2):
+			neighbors[a].add(b)
+			neighbors[b].add(a)
+		for neighbor in neighbors[variable]:
+			neighbors[neighbor].discard(variable)
+
+	home = [min(factor.variables, key=position.get) for factor in factors]
+	return separator, parent, home
+
+
+class InferenceSession():
+	"""
+	Junction-tree inference over a pedigree that keeps its junction tree
+	and messages between queries.
+
+	Known traits only change the values of factors, never which people
+	they mention, so the tree is built once. Changing someone's known
+	trait discards only the messages that depended on it, and queries
+	recompute just the messages they need.
+	"""
+
+	def __init__(self, people):
+		self.people = {person: dict(people[person]) for person in people}
+		self.tables = model_tables()
+		self.factors = {
+			person: person_factor(self.people, person, self.tables)
+			for person in self.people
+		}
+		self.order = elimination_order(list(self.factors.values()))
+		self.separator, self.parent, home = elimination_tree(
+			list(self.factors.values()), self.order
+		)
+
+		# People whose factors are assigned to each clique
+		self.home = dict(zip(self.factors, home))
+		self.residents = {variable: [] for variable in self.order}
+		for person, variable in self.home.items():
+			self.residents[variable].append(person)
+
+		self.children = {variable: [] for variable in self.order}
+		for variable in self.order:
+			if self.parent[variable] is not None:
+				self.children[self.parent[variable]].append(variable)
+
+		# Everyone in each tree of the forest, by its root
+		self.root = dict()
+		self.members = dict()
+		for variable in reversed(self.order):
+			p = self.parent[variable]
+			self.root[variable] = variable if p is None else self.root[p]
+			self.members.setdefault(self.root[variable], []).append(variable)
+
+		# Messages and gene distributions computed so far
+		self.up = dict()
+		self.down = dict()
+		self.gene = dict()
+
+	def set_trait(self, person, trait):
+		"""
+		Set whether person is known to have the trait: True, False, or
+		None if unknown. Discard the messages that depended on it.
+		"""
+		if self.people[person]["trait"] == trait:
+			return
+		self.people[person]["trait"] = trait
+		self.factors[person] = person_factor(self.people, person, self.tables)
+
+		# Messages up from the changed clique, and from its ancestors
+		path = set()
+		variable = self.home[person]
+		while variable is not None:
+			path.add(variable)
+			self.up.pop(variable, None)
+			variable = self.parent[variable]
+
+		# Messages down into any clique whose subtree doesn't hold it,
+		# and the gene distributions of everyone in the same tree
+		for variable in self.members[self.root[self.home[person]]]:
+			if variable not in path:
+				self.down.pop(variable, None)
+			self.gene.pop(variable, None)
+
+	def probabilities(self, people=None):
+		"""
+		Return gene and trait probabilities for people, or everyone if
+		people is None, computing only the messages that aren't known.
+		"""
+		if people is None:
+			people = list(self.people)
+
+		# Pass messages up towards the roots, children before parents
+		for variable in self.order:
+			if variable not in self.up:
+				self.up[variable] = scaled(combine(
+					self.potential(variable) + [
+						self.up[child] for child in self.children[variable]
+					],
+					self.separator[variable]
+				))
+
+		# Pass messages down from the roots to the cliques of people
+		needed = set()
+		for variable in people:
+			while variable is not None and variable not in needed:
+				needed.add(variable)
+				variable = self.parent[variable]
+		for variable in reversed(self.order):
+			p = self.parent[variable]
+			if variable not in needed or variable in self.down or p is None:
+				continue
+			self.down[variable] = scaled(combine(
+				self.potential(p) + self.incoming(p, variable),
+				self.separator[variable]
+			))
+
+		# Combine each person's clique with all its messages
+		for person in people:
+			if person not in self.gene:
+				belief = scaled(combine(
+					self.potential(person) + self.incoming(person),
+					(person,)
+				))
+				self.gene[person] = [belief.table[(genes,)] for genes in GENES]
+		return marginals(
+			{person: self.people[person] for person in people}, self.gene
+		)
+
+	def potential(self, variable):
+		"""
+		Return the list of factors assigned to variable's clique.
+		"""
+		return [self.factors[person] for person in self.residents[variable]]
+
+	def incoming(self, variable, excluding=None):
+		"""
+		Return the list of messages into variable's clique from its
+		neighbors in the tree, other than excluding.
+		"""
+		messages = [
+			self.up[child] for child in self.children[variable]
+			if child != excluding
+		]
+		if self.parent[variable] is not None:
+			messages.append(self.down[variable])
+		return messages
+
+
+def junction_tree(people):
+	"""
+	Compute gene and trait probabilities for each person by passing
+	messages over a junction tree of the pedigree, and return them.
+
+	Genes are the only variables: known traits become likelihoods on
+	genes, and unknown traits are summed out, then computed from each
+	person's gene distribution at the end. For pedigrees without
+	marriages between relatives, cliques have at most three people, so
+	this takes time linear in the size of the family.
+	"""
+	return InferenceSession(people).probabilities()
@@ -0,0 +1,149 @@
+import csv
+import os
+import random
+import sys
+
+from heredity import model_tables
+
+# Probability that someone has children with a founder from outside the
+# family, rather than with a relative of their own generation
+OUTSIDE = 0.7
+
+# Most children a couple has before the last generation, which takes
+# everyone still to come
+CHILDREN = 4
+
+
+def main():
+
+	# Check for proper usage
+	if len(sys.argv) not in [6, 7]:
+		sys.exit(
+			"Usage: python generate.py size generations evidence count "
+			"directory [seed]"
+		)
+	size = int(sys.argv[1])
+	generations = int(sys.argv[2])
+	evidence = float(sys.argv[3])
+	count = int(sys.argv[4])
+	directory = sys.argv[5]
+	seed = int(sys.argv[6]) if len(sys.argv) == 7 else None
+
+	# Write each pedigree in the format read by heredity.load_data
+	rng = random.Random(seed)
+	os.makedirs(directory, exist_ok=True)
+	for i in range(count):
+		try:
+			people = generate_pedigree(size, generations, evidence, rng)
+		except ValueError as e:
+			sys.exit(e)
+		write_data(os.path.join(directory, f"family{i}.csv"), people)
+
+
+def generate_pedigree(size, generations, evidence, rng=random):
+	"""
+	Generate a random pedigree of size people over a number of generations,
+	in the format returned by heredity.load_data.
+
+	Everyone descends from one founding couple, so the pedigree is a single
+	family. Each later generation are children of couples from the
+	generation before, several to a couple, where a couple is someone and
+	either a founder marrying into the family or, now and then, a relative
+	of their generation, so cousins sometimes have children together.
+	Genes and traits are drawn from the model in PROBS, and each person's
+	trait is known with probability evidence.
+
+	Every generation after the first needs a child, and every one before
+	the last a spouse for them, so raise ValueError unless there are at
+	least 2 generations and 2 * generations - 1 people.
+	"""
+	if generations < 2:
+		raise ValueError("A pedigree needs at least 2 generations")
+	if size < 2 * generations - 1:
+		raise ValueError(
+			f"{generations} generations need at least "
+			f"{2 * generations - 1} people"
+		)
+	tables = model_tables()
+	people = dict()
+	genes = dict()
+
+	def add(mother=None, father=None):
+		name = f"P{len(people)}"
+		if mother is None:
+			weights = tables["gene"]
+		else:
+			weights = tables["inheritance"][genes[mother]][genes[father]]
+		genes[name] = rng.choices(range(3), weights)[0]
+		has_trait = rng.random() < tables["trait"][genes[name]][True]
+		people[name] = {
+			"name": name,
+			"mother": mother,
+			"father": father,
+			"trait": has_trait if rng.random() < evidence else None
+		}
+		return name
+
+	couples = [(add(), add())]
+	for remaining in range(generations - 1, 0, -1):
+
+		# Give the couples this generation's share of the people left,
+		# one child each first, keeping a spouse and a child for each
+		# later generation, and everyone left in the last generation
+		left = size - len(people)
+		if remaining == 1:
+			count = left
+		else:
+			count = max(len(couples), min(
+				CHILDREN * len(couples), left // remaining,
+				left - 2 * (remaining - 1)
+			))
+		generation = []
+		while len(generation) < count:
+			if len(generation) < len(couples):
+				mother, father = couples[len(generation)]
+			else:
+				mother, father = rng.choice(couples)
+			generation.append(add(mother, father))
+		if remaining == 1:
+			break
+
+		# Pair up this generation for the next, keeping everyone related
+		unpaired = generation[:]
+		rng.shuffle(unpaired)
+		couples = []
+		while unpaired:
+			person = unpaired.pop()
+
+			# Leave room for a child of every couple, and for the
+			# generations after the next
+			room = (size - len(people) - len(couples)
+					- 2 * (remaining - 2))
+			if unpaired and room >= 1 and (
+					rng.random() >= OUTSIDE or room < 2):
+				couples.append((person, unpaired.pop()))
+			elif room >= 2:
+				couples.append((person, add()))
+
+	return people
+
+
+def write_data(filename, people):
+	"""
+	Write people to a CSV file in the format read by heredity.load_data.
+	"""
+	with open(filename, "w", newline="") as f:
+		writer = csv.writer(f)
+		writer.writerow(["name", "mother", "father", "trait"])
+		for person in people.values():
+			trait = person["trait"]
+			writer.writerow([
+				person["name"],
+				person["mother"] or "",
+				person["father"] or "",
+				"" if trait is None else int(trait)
+			])
+
+
+if __name__ == "__main__":
+	main()
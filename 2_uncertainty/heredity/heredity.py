@@ -1,5 +1,7 @@
 import csv
 import itertools
+import math
+import multiprocessing
 import sys
 
 PROBS = {
@@ -40,48 +42,16 @@ PROBS = {
 def main():
 
 	# Check for proper usage
-	if len(sys.argv) != 2:
-		sys.exit("Usage: python heredity.py data.csv")
+	if len(sys.argv) not in [2, 3]:
+		sys.exit("Usage: python heredity.py data.csv [engine]")
 	people = load_data(sys.argv[1])
+	engines = inference_engines()
+	engine = sys.argv[2] if len(sys.argv) == 3 else "enumeration"
+	if engine not in engines:
+		sys.exit(f"Engine must be one of: {', '.join(engines)}")
 
-	# Keep track of gene and trait probabilities for each person
-	probabilities = {
-		person: {
-			"gene": {
-				2: 0,
-				1: 0,
-				0: 0
-			},
-			"trait": {
-				True: 0,
-				False: 0
-			}
-		}
-		for person in people
-	}
-
-	# Loop over all sets of people who might have the trait
-	names = set(people)
-	for have_trait in powerset(names):
-
-		# Check if current set of people violates known information
-		fails_evidence = any(
-			(people[person]["trait"] is not None and
-			 people[person]["trait"] != (person in have_trait))
-			for person in names
-		)
-		if fails_evidence:
-			continue
-
-		# Loop over all sets of people who might have the gene
-		for one_gene in powerset(names):
-			for two_genes in powerset(names - one_gene):
-				# Update probabilities with new joint probability
-				p = joint_probability(people, one_gene, two_genes, have_trait)
-				update(probabilities, one_gene, two_genes, have_trait, p)
-
-	# Ensure probabilities sum to 1
-	normalize(probabilities)
+	# Compute gene and trait probabilities for each unrelated family
+	probabilities = solve_families(components(people), engine)
 
 	# Print results
 	for person in people:
@@ -93,6 +63,192 @@ def main():
 				print(f"    {value}: {p:.4f}")
 
 
+def inference_engines():
+	"""
+	Return a dictionary mapping the name of each inference engine to a
+	function that takes people and returns their gene and trait
+	probabilities.
+	"""
+	# Imported here, since the engines import from this module
+	from elimination import junction_tree
+
+	engines = {
+		"enumeration": enumeration,
+		"elimination": junction_tree
+	}
+
+	# Sampling engines, with their default numbers of samples
+	from sampling import gibbs_sampling, likelihood_weighting
+	engines["gibbs"] = lambda people: gibbs_sampling(people)[0]
+	engines["likelihood"] = lambda people: likelihood_weighting(people)[0]
+
+	# The vectorized engine is only available if NumPy is installed
+	try:
+		from vectorized import vectorized_enumeration
+	except ImportError:
+		pass
+	else:
+		engines["vectorized"] = vectorized_enumeration
+	return engines
+
+
+def solve_families(families, engine="enumeration", processes=None):
+	"""
+	Compute gene and trait probabilities for each person in a list of
+	families with the named inference engine, and return them.
+	Families are solved in a pool of worker processes if there is more
+	than one family and more than one process.
+	"""
+	tasks = [(engine, family) for family in families]
+	if len(tasks) == 1 or processes == 1:
+		results = [solve_family(task) for task in tasks]
+	else:
+		with multiprocessing.Pool(processes) as pool:
+			results = pool.map(solve_family, tasks)
+
+	probabilities = dict()
+	for result in results:
+		probabilities.update(result)
+	return probabilities
+
+
+def solve_family(task):
+	"""
+	Compute gene and trait probabilities for one family, given as a tuple
+	of the name of an inference engine and the family's people.
+	"""
+	engine, people = task
+	return inference_engines()[engine](people)
+
+
+def enumeration(people):
+	"""
+	Compute gene and trait probabilities for each person by enumerating
+	every assignment of genes, and return them.
+
+	Unknown traits are summed out rather than enumerated, and each
+	person's trait probabilities are computed from their gene
+	probabilities at the end. If some joint probability could be too
+	small to represent as a float, joint probabilities are added up as
+	logarithms instead.
+	"""
+	tables = model_tables()
+	log_space = could_underflow(people, tables)
+	order = topological_order(people)
+
+	# Add up the probability of each number of copies for each person
+	if log_space:
+		totals = [[-math.inf] * 3 for _ in order]
+		for genes, log_p in gene_assignments(people, order, tables, True):
+			for total, copies in zip(totals, genes):
+				total[copies] = log_add(total[copies], log_p)
+		for i, total in enumerate(totals):
+			normalizer = log_sum(total)
+			totals[i] = [math.exp(log_p - normalizer) for log_p in total]
+	else:
+		totals = [[0] * 3 for _ in order]
+		for genes, p in gene_assignments(people, order, tables):
+			for total, copies in zip(totals, genes):
+				total[copies] += p
+		for i, total in enumerate(totals):
+			normalizer = sum(total)
+			totals[i] = [p / normalizer for p in total]
+
+	return marginals(people, dict(zip(order, totals)))
+
+
+def gene_assignments(people, order, tables, log_space=False):
+	"""
+	Yield every assignment of genes to people, given in topological order,
+	that has a nonzero probability of agreeing with the known traits, as a
+	tuple of a list of each person's number of copies, in that order, and
+	that probability, or its logarithm if log_space is true. The list is
+	reused, so should be read before the next assignment is yielded.
+
+	Given someone's genes, their probabilities of having the trait and not
+	sum to 1, so unknown traits drop out. Assignments are built one person
+	at a time, parents first, and abandoned as soon as their probability
+	is 0, so impossible assignments are never completed.
+	"""
+	index = {person: i for i, person in enumerate(order)}
+
+	# For each person, the indices of their parents, if any, and the
+	# probability of each number of copies and their trait, if known
+	rows = []
+	for person in order:
+		mom = people[person]["mother"]
+		dad = people[person]["father"]
+		trait = people[person]["trait"]
+		if mom is None and dad is None:
+			if trait is None:
+				table = tables["gene"]
+			else:
+				table = [tables["founder"][copies][trait] for copies in range(3)]
+			parents = None
+		else:
+			if trait is None:
+				table = tables["inheritance"]
+			else:
+				table = [
+					[[tables["child"][m][d][copies][trait] for copies in range(3)]
+					 for d in range(3)]
+					for m in range(3)
+				]
+			parents = (index[mom], index[dad])
+		if log_space:
+			table = [log(p) for p in table] if parents is None else [
+				[[log(p) for p in row] for row in rows_by_dad]
+				for rows_by_dad in table
+			]
+		rows.append((parents, table))
+
+	genes = [0] * len(order)
+	impossible = -math.inf if log_space else 0
+
+	def extend(i, p):
+		if i == len(order):
+			yield genes, p
+			return
+		parents, table = rows[i]
+		row = table if parents is None else (
+			table[genes[parents[0]]][genes[parents[1]]]
+		)
+		for copies in range(3):
+			if row[copies] == impossible:
+				continue
+			genes[i] = copies
+			yield from extend(
+				i + 1, p + row[copies] if log_space else p * row[copies]
+			)
+
+	yield from extend(0, 0 if log_space else 1)
+
+
+def marginals(people, gene):
+	"""
+	Return gene and trait probabilities for each person, in the format
+	printed by main, given a dictionary mapping each person to their
+	probabilities of having 0, 1 and 2 copies of the gene.
+	Unknown traits are computed from those gene probabilities.
+	"""
+	tables = model_tables()
+	probabilities = dict()
+	for person in people:
+		trait = people[person]["trait"]
+		if trait is None:
+			has_trait = sum(
+				gene[person][copies] * tables["trait"][copies][True]
+				for copies in range(3)
+			)
+		else:
+			has_trait = 1 if trait else 0
+		probabilities[person] = {
+			"gene": {copies: gene[person][copies] for copies in (2, 1, 0)},
+			"trait": {True: has_trait, False: 1 - has_trait}
+		}
+	return probabilities
+
+
 def load_data(filename):
 	"""
 	Load gene and trait data from a file into a dictionary.
@@ -115,6 +271,74 @@ def load_data(filename):
 	return data
 
 
+def load_families(filename):
+	"""
+	Load gene and trait data from a file, as load_data does, and return
+	it split into unrelated families, as components does.
+	"""
+	return components(load_data(filename))
+
+
+def components(people):
+	"""
+	Split people into families that are connected by parent links,
+	returning a list of dictionaries of the people in each family.
+	No one in one family is related to anyone in another, so each
+	family's probabilities can be computed on its own.
+	"""
+
+	# Merge each person's family with their parents' families
+	root = {person: person for person in people}
+
+	def find(person):
+		while root[person] != person:
+			root[person] = root[root[person]]
+			person = root[person]
+		return person
+
+	for person in people:
+		for parent in (people[person]["mother"], people[person]["father"]):
+			if parent is not None:
+				root[find(parent)] = find(person)
+
+	families = dict()
+	for person in people:
+		families.setdefault(find(person), dict())[person] = people[person]
+	return list(families.values())
+
+
+def topological_order(people):
+	"""
+	Return a list of people in which everyone comes after their parents.
+	Raise ValueError if someone is their own ancestor.
+	"""
+	order = []
+	placed = set()
+	visiting = set()
+	for person in people:
+		stack = [(person, False)]
+		while stack:
+			current, expanded = stack.pop()
+			if current in placed:
+				continue
+			if expanded:
+				visiting.discard(current)
+				placed.add(current)
+				order.append(current)
+				continue
+			if current in visiting:
+				raise ValueError(f"{current} is their own ancestor")
+
+			# Place parents first, then come back to this person
+			visiting.add(current)
+			stack.append((current, True))
+			for parent in (people[current]["mother"],
+						   people[current]["father"]):
+				if parent is not None and parent not in placed:
+					stack.append((parent, False))
+	return order
+
+
 def powerset(s):
 	"""
 	Return a list of all possible subsets of set s.
@@ -127,7 +351,7 @@ def powerset(s):
 	]
 
 
-def joint_probability(people, one_gene, two_genes, have_trait):
+def joint_probability(people, one_gene, two_genes, have_trait, tables=None):
 	"""
 	Compute and return a joint probability.
 
@@ -137,160 +361,168 @@ def joint_probability(people, one_gene, two_genes, have_trait):
 			* everyone not in `one_gene` or `two_gene` does not have the gene, and
 			* everyone in set `have_trait` has the trait, and
 			* everyone not in set` have_trait` does not have the trait.
+
+	`tables` are the tables from model_tables, which callers computing
+	many joint probabilities can look up once and pass in.
 	"""
+	if tables is None:
+		tables = model_tables()
+	founder = tables["founder"]
+	child = tables["child"]
 
-	cumulative_probability = 1
+	genes = dict.fromkeys(people, 0)
+	for person in one_gene:
+		genes[person] = 1
+	for person in two_genes:
+		genes[person] = 2
 
+	cumulative_probability = 1
 	for person in people:
-		probability = 1
-		# probability that the person has one gene
-		if person in one_gene:
-			# find their parents
-			mom = people[person]['mother']
-			dad = people[person]['father']
-			# if person has no parents
-			if mom == None and dad == None:
-				# unconditional probability of having one gene
-				probability = PROBS["gene"][1]
-			# if person has parents
-			else:
-				# gene comes from mother and not father (p1)
-				if mom in one_gene:
-					# mom has one harmful gene
-					# harmful gene is selected from mom with p = 0.5
-					# after being selected, it comes to person with p = 1 - PROBS["mutation"]
-					# harmless gene is selected from mom with p = 0.5
-					# after being selected, it turns into the harmful one with p  = PROBS["mutation"]
-					# hence, p1 = 0.5 * (1 - PROBS["mutation"]) + 0.5 * PROBS["mutation"]
-					# this simplifies to 0.5
-					p1 = 0.5					
-				elif mom in two_genes:
-					# mom has both harmful genes
-					# no matter which is selected,
-					# it stays harmful with p = 1 - PROBS["mutation"]
-					p1 = 1 - PROBS["mutation"]
-				else:
-					# mom has no harmful genes
-					# no matter which is selected
-					# becomes harmful with p = 0.01
-					p1 = PROBS["mutation"]
-				
-				if dad in one_gene:
-					# harmless gene is selected from dad with p = 0.5
-					# after being selected, remains harmless with p = 1 - PROBS["mutation"]
-					# harmful gene is selected from dad with p = 0.5
-					# after being selected, it becomes harmless with p = PROBS["mutation"]
-					# again, simplifies to 0.5
-					p1 *= 0.5
-					# (multiplying because joint probability)
-				elif dad in two_genes:
-					# no matter which gene is selected
-					# it mutates into the harmless form with p = PROBS["mutation"]
-					p1 *= PROBS["mutation"]
-				else:
-					# this means dad has no harmful gene
-					# no matter which harmless gene is selected
-					# it stays harmless with probability 1 - PROBS["mutation"]
-					p1 *= 1 - PROBS["mutation"]
-
-				# gene comes from father and not mother (p2)
-				if mom in one_gene:
-					# mom has one harmful gene
-					# harmful gene is selected with probability 0.5
-					# becomes harmless with p = PROBS["mutation"]
-					# harmless gene is selected with probability 0.5
-					# becomes harmless with p = 1 - PROBS["mutation"]
-					# simplifies to 0.5
-					p2 = 0.5
-				elif mom in two_genes:
-					# both genes harmful
-					# harmless can come only from mutation
-					p2 = PROBS["mutation"]
-				else:
-					# mom has no harmful gene
-					# harmless stays harmless with p = 1 - PROBS["mutation"]
-					p2 = 1 - PROBS["mutation"]
-
-				if dad in one_gene:
-					# dad has one harmful gene
-					# selected with p = 0.5
-					p2 *= 0.5
-				elif dad in two_genes:
-					# dad has both harmful genes
-					# stays harmful if doesn'tm mutate
-					p2 *= 1 - PROBS["mutation"]
-				else:
-					# no harmful gene
-					# can get through mutation
-					p2 *= PROBS["mutation"]
-
-				probability = p1 + p2
-
-			# given one harmful gene
-			# probability of train/not
-			probability *= PROBS["trait"][1][person in have_trait]
-
-		elif person in two_genes:
-			# find their parents
-			mom = people[person]['mother']
-			dad = people[person]['father']
-			# if a person has no parents
-			if mom == None and dad == None:
-				# unconditional probability of having two genes
-				probability = PROBS["gene"][2]
-			else:
-				# both genes harmful
-				# one harmful gene comes from each parent
-				if mom in one_gene:
-					probability = 0.5
-				elif mom in two_genes:
-					probability = 1 - PROBS["mutation"]
-				else:
-					probability = PROBS["mutation"]
-
-				if dad in one_gene:
-					probability *= 0.5
-				elif dad in two_genes:
-					probability *= 1 - PROBS["mutation"]
-				else:
-					probability *= PROBS["mutation"]
-
-			# given two genes,
-			# probablity of trait
-			probability *= PROBS["trait"][2][person in have_trait]
+		mom = people[person]['mother']
+		dad = people[person]['father']
 
+		# probability of the person's genes, given their parents' if any,
+		# and of their trait or not given their genes
+		if mom is None and dad is None:
+			probability = founder[genes[person]][person in have_trait]
 		else:
-			# person has no harmful genes
-			# find his parents
-			mom = people[person]['mother']
-			dad = people[person]['father']
-
-			if mom == None and dad == None:
-				# unconditional probability of having no harmful genes
-				probability = PROBS["gene"][0]
-			else:
-				# no harmful genes come from parents
-				if mom in one_gene:
-					probability = 0.5
-				elif mom in two_genes:
-					probability = 1 - PROBS["mutation"]
-				else:
-					probability = PROBS["mutation"]
-				
-				if dad in one_gene:
-					probability *= 0.5
-				elif dad in two_genes:
-					probability *= 1 - PROBS["mutation"]
-				else:
-					probability *= PROBS["mutation"]
-
-		# given no harmful genes, probability of trait
-		probability *= PROBS["trait"][0][person in have_trait]
+			probability = child[genes[mom]][genes[dad]][genes[person]][
+				person in have_trait
+			]
 
 		cumulative_probability *= probability
-	
+
 	return cumulative_probability
 
+
+def could_underflow(people, tables=None):
+	"""
+	Return whether some joint probability of people could be too small to
+	represent as a float, judging by the smallest nonzero probability in
+	each person's table.
+	"""
+	if tables is None:
+		tables = model_tables()
+	smallest = 0
+	for person in people:
+		if people[person]["mother"] is None and people[person]["father"] is None:
+			table = tables["log_founder"]
+		else:
+			table = tables["log_child"]
+		smallest += min(
+			log_p for log_p in flatten(table) if log_p != -math.inf
+		)
+	return smallest < math.log(sys.float_info.min)
+
+
+def flatten(table):
+	"""
+	Yield the numbers in a table of nested lists.
+	"""
+	for entry in table:
+		if isinstance(entry, list):
+			yield from flatten(entry)
+		else:
+			yield entry
+
+
+def log(p):
+	"""
+	Return the natural logarithm of p, or -math.inf if p is 0.
+	"""
+	return math.log(p) if p > 0 else -math.inf
+
+
+def model_tables():
+	"""
+	Return tables of the probabilities in PROBS, indexed by number of
+	copies of the gene rather than looked up in dictionaries:
+		* "gene": unconditional probability of each number of copies,
+		* "inheritance": probability of each number of copies given the
+		  mother's and father's numbers of copies, as [mom][dad][child],
+		* "trait": probability of not having and having the trait given
+		  each number of copies, as [genes][has trait],
+		* "founder": joint probability of a person without parents having
+		  each number of copies and trait, as [genes][has trait],
+		* "child": joint probability of a child having each number of
+		  copies and trait given their parents' copies, as
+		  [mom][dad][child][has trait],
+		* "log_founder" and "log_child": the logarithms of "founder" and
+		  "child", with -math.inf for probabilities of 0.
+	The tables are built once, and rebuilt if PROBS has changed since.
+	"""
+	global _tables, _tables_key
+
+	key = (
+		tuple(PROBS["gene"].items()),
+		tuple((genes, tuple(trait.items()))
+			  for genes, trait in PROBS["trait"].items()),
+		PROBS["mutation"]
+	)
+	if key == _tables_key:
+		return _tables
+
+	# Probability that a parent passes on a harmful gene: a harmful gene
+	# they have unless it mutates, or a harmless one if it mutates.
+	# With one copy of each, either is selected with p = 0.5, which
+	# simplifies to 0.5 whatever the mutation probability.
+	mutation = PROBS["mutation"]
+	passes = [mutation, 0.5, 1 - mutation]
+
+	# The child gets one gene from each parent
+	inheritance = [
+		[
+			[
+				(1 - passes[mom]) * (1 - passes[dad]),
+				passes[mom] * (1 - passes[dad]) + (1 - passes[mom]) * passes[dad],
+				passes[mom] * passes[dad]
+			]
+			for dad in range(3)
+		]
+		for mom in range(3)
+	]
+
+	prior = [PROBS["gene"][genes] for genes in range(3)]
+	trait = [
+		[PROBS["trait"][genes][False], PROBS["trait"][genes][True]]
+		for genes in range(3)
+	]
+	founder = [
+		[prior[genes] * trait[genes][has] for has in range(2)]
+		for genes in range(3)
+	]
+	child = [
+		[
+			[
+				[inheritance[mom][dad][genes] * trait[genes][has]
+				 for has in range(2)]
+				for genes in range(3)
+			]
+			for dad in range(3)
+		]
+		for mom in range(3)
+	]
+	_tables = {
+		"gene": prior,
+		"inheritance": inheritance,
+		"trait": trait,
+		"founder": founder,
+		"child": child,
+		"log_founder": [[log(p) for p in row] for row in founder],
+		"log_child": [
+			[[[log(p) for p in row] for row in dad] for dad in mom]
+			for mom in child
+		]
+	}
+	_tables_key = key
+	return _tables
+
+
+# Tables built by model_tables, and the PROBS they were built from
+_tables = None
+_tables_key = None
+
+
 def update(probabilities, one_gene, two_genes, have_trait, p):
 	"""
 	Add to `probabilities` a new joint probability `p`.
@@ -328,5 +560,27 @@ def normalize(probabilities):
 		probabilities[person]["trait"][False] /= trait_sum
 
 
+def log_add(a, b):
+	"""
+	Return log(exp(a) + exp(b)) without overflow or underflow.
+	"""
+	if a < b:
+		a, b = b, a
+	if b == -math.inf:
+		return a
+	return a + math.log1p(math.exp(b - a))
+
+
+def log_sum(values):
+	"""
+	Return the logarithm of the sum of the exponentials of values.
+	"""
+	values = list(values)
+	largest = max(values)
+	if largest == -math.inf:
+		return largest
+	return largest + math.log(sum(math.exp(v - largest) for v in values))
+
+
 if __name__ == "__main__":
 	main()
@@ -0,0 +1,384 @@
+import argparse
+import math
+import multiprocessing
+import random
+import time
+
+from heredity import load_data, marginals, model_tables, topological_order
+
+# Samples kept per chain
+SAMPLES = 10000
+
+# Sweeps discarded at the start of each Gibbs chain
+BURN_IN = 1000
+
+# Sweeps per sample kept after burn-in
+THINNING = 1
+
+# Chains run, in parallel processes if more than one
+CHAINS = 4
+
+
+def main():
+	parser = argparse.ArgumentParser(
+		description="Estimate gene and trait probabilities by sampling."
+	)
+	parser.add_argument("data", help="CSV file of people")
+	parser.add_argument("--method", choices=["gibbs", "likelihood"],
+						default="gibbs",
+						help="Gibbs sampling or likelihood weighting")
+	parser.add_argument("--samples", type=int, default=SAMPLES,
+						help="samples kept per chain")
+	parser.add_argument("--burn-in", type=int, default=BURN_IN,
+						help="sweeps discarded at the start of each chain")
+	parser.add_argument("--thinning", type=int, default=THINNING,
+						help="sweeps per sample kept")
+	parser.add_argument("--chains", type=int, default=CHAINS)
+	parser.add_argument("--seed", type=int,
+						help="seed of the first chain; chain i uses seed + i")
+	parser.add_argument("--processes", type=int,
+						help="worker processes (default one per CPU)")
+	args = parser.parse_args()
+	people = load_data(args.data)
+
+	start = time.perf_counter()
+	if args.method == "gibbs":
+		probabilities, diagnostics = gibbs_sampling(
+			people, args.samples, args.burn_in, args.thinning, args.chains,
+			args.seed, args.processes
+		)
+	else:
+		probabilities, diagnostics = likelihood_weighting(
+			people, args.samples, args.chains, args.seed, args.processes
+		)
+	seconds = time.perf_counter() - start
+
+	# Print results, as heredity.py does
+	for person in people:
+		print(f"{person}:")
+		for field in probabilities[person]:
+			print(f"  {field.capitalize()}:")
+			for value in probabilities[person][field]:
+				p = probabilities[person][field][value]
+				print(f"    {value}: {p:.4f}")
+
+	print(f"Samples: {diagnostics['samples']} in {seconds:.2f}s")
+	print(f"Effective sample size: min "
+		  f"{min(diagnostics['ess'].values()):.1f}")
+	if diagnostics["r_hat"] is not None:
+		print(f"R-hat: max {max(diagnostics['r_hat'].values()):.4f}")
+
+
+def network(people):
+	"""
+	Return the heredity network of people in the form the samplers use:
+	a tuple of the people in topological order, and lists indexed by
+	their position in that order of each person's mother, father,
+	children, and table of the probability of their genes and known
+	trait, as [mom's genes][dad's genes][genes].
+
+	People without parents have the index one past the last person as
+	their mother and father. Samplers keep that index at 0 genes, and
+	each such person's table is the same for any parents' genes.
+	"""
+	tables = model_tables()
+	names = topological_order(people)
+	index = {name: i for i, name in enumerate(names)}
+	nobody = len(names)
+
+	mother, father, table = [], [], []
+	children = [[] for _ in names]
+	for i, name in enumerate(names):
+		trait = people[name]["trait"]
+		if people[name]["mother"] is None and people[name]["father"] is None:
+			mother.append(nobody)
+			father.append(nobody)
+			if trait is None:
+				row = tables["gene"]
+			else:
+				row = [tables["founder"][genes][trait] for genes in range(3)]
+			table.append([[row] * 3] * 3)
+		else:
+			mother.append(index[people[name]["mother"]])
+			father.append(index[people[name]["father"]])
+			children[mother[i]].append(i)
+			if father[i] != mother[i]:
+				children[father[i]].append(i)
+			if trait is None:
+				table.append(tables["inheritance"])
+			else:
+				table.append([
+					[
+						[tables["child"][mom][dad][genes][trait]
+						 for genes in range(3)]
+						for dad in range(3)
+					]
+					for mom in range(3)
+				])
+	return names, mother, father, children, table
+
+
+def gibbs_sampling(people, samples=SAMPLES, burn_in=BURN_IN,
+				   thinning=THINNING, chains=CHAINS, seed=None,
+				   processes=None):
+	"""
+	Estimate gene and trait probabilities for each person by Gibbs
+	sampling, running chains with seeds seed, seed + 1 and so on.
+
+	Return a tuple of the probabilities and a dictionary of diagnostics:
+	the number of samples kept, and the effective sample size and split
+	R-hat of each person's number of copies of the gene.
+	"""
+	tasks = [
+		(people, samples, burn_in, thinning,
+		 None if seed is None else seed + chain)
+		for chain in range(chains)
+	]
+	results = run_chains(gibbs_chain, tasks, processes)
+
+	# Average the chains' estimates, each from the same number of samples
+	names = list(people)
+	gene = {
+		name: [sum(result[0][name][genes] for result in results) / chains
+			   for genes in range(3)]
+		for name in names
+	}
+
+	# Diagnose the number of copies of each person, over every chain
+	diagnostics = {
+		"samples": samples * chains,
+		"ess": {
+			name: sum(
+				effective_sample_size(result[1][name]) for result in results
+			)
+			for name in names
+		},
+		"r_hat": {
+			name: split_r_hat([result[1][name] for result in results])
+			for name in names
+		}
+	}
+	return marginals(people, gene), diagnostics
+
+
+def gibbs_chain(task):
+	"""
+	Run one Gibbs chain, given as a tuple of people, samples to keep,
+	burn-in, thinning and seed.
+
+	Each sweep resamples every person's genes given everyone else's.
+	Rather than counting sampled genes, each kept sweep adds the
+	distribution each person's genes were sampled from, which estimates
+	the same probabilities with less variance.
+	Return a tuple of dictionaries mapping each person to their estimated
+	gene probabilities, and to the bytes of their sampled numbers of copies.
+	"""
+	people, samples, burn_in, thinning, seed = task
+	rng = random.Random(seed)
+	names, mother, father, children, table = network(people)
+	n = len(names)
+
+	# Start from a sample of everyone's genes given their parents'
+	state = [0] * (n + 1)
+	for i in range(n):
+		weights = table[i][state[mother[i]]][state[father[i]]]
+		state[i] = rng.choices(range(3), weights)[0]
+
+	totals = [[0, 0, 0] for _ in range(n)]
+	series = [bytearray() for _ in range(n)]
+	weights = [0, 0, 0]
+	for sweep in range(burn_in + samples * thinning):
+		keep = sweep >= burn_in and (sweep - burn_in) % thinning == 0
+		for i in range(n):
+			mom, dad = state[mother[i]], state[father[i]]
+			for genes in range(3):
+				state[i] = genes
+				weight = table[i][mom][dad][genes]
+				for child in children[i]:
+					weight *= table[child][state[mother[child]]][
+						state[father[child]]][state[child]]
+				weights[genes] = weight
+			total = weights[0] + weights[1] + weights[2]
+			r = rng.random() * total
+			state[i] = 0 if r < weights[0] else (
+				1 if r < weights[0] + weights[1] else 2
+			)
+			if keep:
+				for genes in range(3):
+					totals[i][genes] += weights[genes] / total
+				series[i].append(state[i])
+
+	gene = {
+		name: [total / samples for total in totals[i]]
+		for i, name in enumerate(names)
+	}
+	return gene, {name: bytes(series[i]) for i, name in enumerate(names)}
+
+
+def likelihood_weighting(people, samples=SAMPLES, chains=CHAINS, seed=None,
+						 processes=None):
+	"""
+	Estimate gene and trait probabilities for each person by likelihood
+	weighting, drawing samples in chains with seeds seed, seed + 1 and
+	so on.
+
+	Return a tuple of the probabilities and a dictionary of diagnostics:
+	the number of samples, the effective sample size of the weights for
+	each person, and an R-hat of None, since samples are independent.
+	"""
+	tasks = [
+		(people, samples, None if seed is None else seed + chain)
+		for chain in range(chains)
+	]
+	results = run_chains(likelihood_chain, tasks, processes)
+
+	# Rescale each chain's sums of weights to the largest log weight
+	largest = max(result[0] for result in results)
+	names = list(people)
+	gene = {name: [0, 0, 0] for name in names}
+	weight = 0
+	squared = 0
+	for top, totals, total, total_squared in results:
+		scale = math.exp(top - largest)
+		for name in names:
+			for genes in range(3):
+				gene[name][genes] += totals[name][genes] * scale
+		weight += total * scale
+		squared += total_squared * scale ** 2
+	for name in names:
+		gene[name] = [total / weight for total in gene[name]]
+
+	ess = weight ** 2 / squared
+	diagnostics = {
+		"samples": samples * chains,
+		"ess": {name: ess for name in names},
+		"r_hat": None
+	}
+	return marginals(people, gene), diagnostics
+
+
+def likelihood_chain(task):
+	"""
+	Draw samples for likelihood weighting, given as a tuple of people,
+	number of samples and seed.
+
+	Each sample draws everyone's genes given their parents', weighted by
+	the likelihood of the known traits. Weights are kept as logarithms,
+	since a product of many small likelihoods can underflow.
+	Return a tuple of the largest log weight, a dictionary mapping each
+	person to the total weight of samples with each number of copies,
+	and the total and total squared weight, all scaled by the largest.
+	"""
+	people, samples, seed = task
+	rng = random.Random(seed)
+	tables = model_tables()
+	names, mother, father, children, _ = network(people)
+	n = len(names)
+
+	# Sample genes from inheritance alone, weighting by known traits
+	inheritance = [
+		[[tables["gene"]] * 3] * 3
+		if mother[i] == n else tables["inheritance"]
+		for i in range(n)
+	]
+	likelihood = [
+		None if people[name]["trait"] is None else [
+			math.log(tables["trait"][genes][people[name]["trait"]])
+			for genes in range(3)
+		]
+		for name in names
+	]
+
+	draws = []
+	log_weights = []
+	state = [0] * (n + 1)
+	for _ in range(samples):
+		log_weight = 0
+		for i in range(n):
+			weights = inheritance[i][state[mother[i]]][state[father[i]]]
+			state[i] = rng.choices(range(3), weights)[0]
+			if likelihood[i] is not None:
+				log_weight += likelihood[i][state[i]]
+		draws.append(bytes(state[:n]))
+		log_weights.append(log_weight)
+
+	top = max(log_weights)
+	totals = [[0, 0, 0] for _ in range(n)]
+	total = 0
+	total_squared = 0
+	for draw, log_weight in zip(draws, log_weights):
+		weight = math.exp(log_weight - top)
+		total += weight
+		total_squared += weight ** 2
+		for i in range(n):
+			totals[i][draw[i]] += weight
+	gene = {name: totals[i] for i, name in enumerate(names)}
+	return top, gene, total, total_squared
+
+
+def run_chains(chain, tasks, processes=None):
+	"""
+	Run chain on each task, in a pool of worker processes if there is more
+	than one task and more than one process, and return the results.
+	Worker processes can't start pools of their own, so chains run one
+	after another in them.
+	"""
+	if (len(tasks) == 1 or processes == 1
+			or multiprocessing.current_process().daemon):
+		return [chain(task) for task in tasks]
+	with multiprocessing.Pool(processes) as pool:
+		return pool.map(chain, tasks)
+
+
+def effective_sample_size(series):
+	"""
+	Estimate the effective sample size of a chain's series of values by
+	batch means: the variance of the means of about sqrt(n) batches shows
+	how much more the chain varies than independent samples would.
+	"""
+	n = len(series)
+	size = max(1, math.isqrt(n))
+	batches = n // size
+	if batches < 2:
+		return float(n)
+	values = series[:batches * size]
+	mean = sum(values) / len(values)
+	variance = sum((value - mean) ** 2 for value in values) / len(values)
+	if variance == 0:
+		return float(n)
+	means = [
+		sum(values[b * size:(b + 1) * size]) / size for b in range(batches)
+	]
+	batch_variance = sum((m - mean) ** 2 for m in means) / (batches - 1)
+	if batch_variance == 0:
+		return float(n)
+	return min(float(n), n * variance / (size * batch_variance))
+
+
+def split_r_hat(chains):
+	"""
+	Return the split R-hat of chains' series of values: each chain is split
+	in half, and the variance between halves is compared to the variance
+	within them. Values near 1 suggest the chains have mixed.
+	"""
+	halves = []
+	for series in chains:
+		middle = len(series) // 2
+		halves.extend([series[:middle], series[middle:2 * middle]])
+	n = len(halves[0])
+	if n < 2:
+		return None
+	means = [sum(half) / n for half in halves]
+	within = sum(
+		sum((value - mean) ** 2 for value in half) / (n - 1)
+		for half, mean in zip(halves, means)
+	) / len(halves)
+	if within == 0:
+		return 1.0
+	grand = sum(means) / len(means)
+	between = n * sum((mean - grand) ** 2 for mean in means) / (len(means) - 1)
+	return math.sqrt(((n - 1) / n * within + between / n) / within)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,88 @@
+import numpy as np
+
+from heredity import model_tables
+
+# Most joint probabilities to hold in memory at once
+CHUNK = 1 << 22
+
+
+def vectorized_enumeration(people):
+	"""
+	Compute gene and trait probabilities for each person by enumerating
+	every assignment of genes and traits, as enumeration does, but with
+	the joint probabilities of many assignments computed at once.
+
+	Gene assignments are numbered in base 3, with one digit per person,
+	and assignments of the traits that are not known are numbered as
+	bitmasks, with one bit per person whose trait is unknown. Each chunk
+	of gene assignments gives a matrix of joint probabilities, with a row
+	per gene assignment and a column per trait assignment.
+	"""
+	names = list(people)
+	n = len(names)
+	index = {name: i for i, name in enumerate(names)}
+	unknown = [i for i, name in enumerate(names)
+			   if people[name]["trait"] is None]
+
+	# Tables to gather probabilities from
+	tables = model_tables()
+	prior = np.array(tables["gene"])
+	inherit = np.array(tables["inheritance"])
+	trait = np.array(tables["trait"])
+
+	# Each unknown trait in each trait assignment, with a row per person
+	masks = np.arange(1 << len(unknown))
+	traits = (masks[None, :] >> np.arange(len(unknown))[:, None]) & 1
+
+	gene_totals = np.zeros((n, 3))
+	trait_totals = np.zeros(len(unknown))
+	rows = max(1, CHUNK >> len(unknown))
+	powers = 3 ** np.arange(n)
+	for start in range(0, 3 ** n, rows):
+		assignments = np.arange(start, min(start + rows, 3 ** n))
+		genes = assignments[:, None] // powers % 3
+
+		# Probability of each gene assignment, and of each known trait
+		weight = np.ones(len(assignments))
+		for i, name in enumerate(names):
+			mother = people[name]["mother"]
+			father = people[name]["father"]
+			if mother is None and father is None:
+				weight *= prior[genes[:, i]]
+			else:
+				weight *= inherit[
+					genes[:, index[mother]], genes[:, index[father]],
+					genes[:, i]
+				]
+			if people[name]["trait"] is not None:
+				weight *= trait[genes[:, i], int(people[name]["trait"])]
+
+		# Probability of each assignment of the unknown traits
+		joint = np.broadcast_to(weight[:, None], (len(weight), len(masks)))
+		for bit, i in enumerate(unknown):
+			joint = joint * trait[genes[:, i][:, None], traits[bit][None, :]]
+
+		# Sum joint probabilities into each person's distributions
+		genes_weight = joint.sum(axis=1)
+		for i in range(n):
+			gene_totals[i] += np.bincount(
+				genes[:, i], weights=genes_weight, minlength=3
+			)
+		trait_totals += traits @ joint.sum(axis=0)
+
+	# Normalize, giving known traits all of their probability
+	total = gene_totals[0].sum()
+	probabilities = dict()
+	for i, name in enumerate(names):
+		if people[name]["trait"] is None:
+			has_trait = trait_totals[unknown.index(i)] / total
+		else:
+			has_trait = 1 if people[name]["trait"] else 0
+		probabilities[name] = {
+			"gene": {
+				genes: float(gene_totals[i][genes] / total)
+				for genes in (2, 1, 0)
+			},
+			"trait": {True: float(has_trait), False: float(1 - has_trait)}
+		}
+	return probabilities
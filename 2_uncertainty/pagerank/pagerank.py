@@ -4,9 +4,20 @@ import random
 import re
 import sys
 
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:
+    np = sparse = None
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Largest total change in PageRank values, and most iterations, before
+# sparse_pagerank stops
+TOLERANCE = 1e-6
+MAX_ITERATIONS = 1000
+
 
 def main():
     # if len(sys.argv) != 2:
@@ -29,6 +40,13 @@ def main():
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
+    if sparse is not None:
+        ranks = sparse_pagerank(corpus, DAMPING)
+        print(f"PageRank Results from Sparse Iteration")
+
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+
 
 def crawl(directory):
     """
@@ -135,12 +153,80 @@ def iterate_pagerank(corpus, damping_factor):
     return ranks
 
 def iterative_sum(corpus, distribution, page):
+    """
+    Return the sum, over every page linking to `page`, of its PageRank
+    value divided by its number of links. A page with no links counts
+    as linking to every page in the corpus, itself included.
+    """
     s = 0
     
-    for page in distribution:
-        s += distribution[page] / len(corpus[page])
+    for other in distribution:
+        if page in corpus[other]:
+            s += distribution[other] / len(corpus[other])
+        elif not corpus[other]:
+            s += distribution[other] / len(corpus)
 
     return s
 
+
+def transition_matrix(corpus):
+    """
+    Return a tuple of the list of pages in `corpus`, a sparse matrix in
+    CSR format whose entry [i, j] is the probability of following a link
+    from page j to page i, and a boolean array of which pages have no
+    links to follow.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    n = len(pages)
+
+    counts = np.fromiter((len(corpus[page]) for page in pages), dtype=np.int64,
+                         count=n)
+    sources = np.repeat(np.arange(n), counts)
+    targets = np.fromiter(
+        (index[link] for page in pages for link in corpus[page]),
+        dtype=np.int64, count=counts.sum()
+    )
+    weights = 1 / counts[sources]
+    links = sparse.csr_matrix((weights, (targets, sources)), shape=(n, n))
+    return pages, links, counts == 0
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS):
+    """
+    Return PageRank values for each page by power iteration with a sparse
+    transition matrix, as iterate_pagerank computes them, until the values
+    change by less than `tolerance` in total or after `max_iterations`.
+
+    The matrix is built once, and each iteration is one sparse product,
+    so this scales to corpora of millions of pages. The PageRank of pages
+    with no links is spread evenly over every page, as iterate_pagerank
+    does.
+
+    Return a dictionary where keys are page names, and values are
+    their estimated PageRank value (a value between 0 and 1). All
+    PageRank values should sum to 1.
+    """
+    if sparse is None:
+        raise ImportError("sparse_pagerank requires numpy and scipy")
+
+    pages, links, dangling = transition_matrix(corpus)
+    n = len(pages)
+    d = damping_factor
+
+    ranks = np.full(n, 1 / n)
+    for _ in range(max_iterations):
+        new_ranks = links @ ranks
+        new_ranks += ranks[dangling].sum() / n
+        new_ranks *= d
+        new_ranks += (1 - d) / n
+        change = np.abs(new_ranks - ranks).sum()
+        ranks = new_ranks
+        if change < tolerance:
+            break
+
+    return dict(zip(pages, ranks.tolist()))
+
 if __name__ == "__main__":
     main()
\ No newline at end of file